@@ -6,9 +6,11 @@ Provides high-level overview of trades per city.
 
 import argparse
 import json
+import os
 import re
 import sys
-from collections import defaultdict
+from collections import defaultdict, namedtuple
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime, timedelta
 from pathlib import Path
 
@@ -22,6 +24,120 @@ class Colors:
     RESET = '\033[0m'
 
 
+# One analysis unit: a single region of a single player profile.
+# `profile` is None for the legacy layout (`<logs dir>/<region>/remaining-*.json`).
+LogTarget = namedtuple('LogTarget', [
+    'profile', 'region', 'history_file', 'deficit_file', 'surplus_file', 'base_log', 'iteration_log_dir',
+])
+
+# TrRAt_<profile>_<region>_remaining-{deficit,surplus}.json, see mod_trade_planner_hl.lua
+REGION_FILE_RE = re.compile(r'^TrRAt_(?P<profile>.+?)_(?P<region>[A-Z]{2})_remaining-(?:deficit|surplus)\.json$')
+REGION_FIELD_RE = re.compile(r'\bregion=(\w+)')
+AREA_ID_RE = re.compile(r'\(id=(\d+)\)')
+
+
+def discover_log_targets(logs_dir, regions=None):
+    """
+    Find every (profile, region) pair that has logs in `logs_dir`.
+
+    Per-player files (`TrRAt_<profile>_*`) are preferred; if there are none, the legacy
+    per-region directories (`<logs_dir>/<region>/remaining-deficit.json`) are used.
+    """
+    logs_dir = Path(logs_dir)
+    targets = {}
+    if not logs_dir.is_dir():
+        return []
+
+    for path in sorted(logs_dir.glob('TrRAt_*_remaining-*.json')):
+        match = REGION_FILE_RE.match(path.name)
+        if not match:
+            continue
+        profile, region = match.group('profile'), match.group('region')
+        if regions and region not in regions:
+            continue
+        prefix = logs_dir / f"TrRAt_{profile}_"
+        targets[(profile, region)] = LogTarget(
+            profile=profile,
+            region=region,
+            history_file=Path(f"{prefix}trade-executor-history.json"),
+            deficit_file=Path(f"{prefix}{region}_remaining-deficit.json"),
+            surplus_file=Path(f"{prefix}{region}_remaining-surplus.json"),
+            base_log=Path(f"{prefix}base.log"),
+            iteration_log_dir=None,
+        )
+
+    if targets:
+        return list(targets.values())
+
+    for region_dir in sorted(p for p in logs_dir.iterdir() if p.is_dir()):
+        region = region_dir.name
+        if regions and region not in regions:
+            continue
+        deficit_file = region_dir / 'remaining-deficit.json'
+        surplus_file = region_dir / 'remaining-surplus.json'
+        has_iteration_logs = any(region_dir.glob('trade-execute-iteration.*.log*'))
+        if not (deficit_file.exists() or surplus_file.exists() or has_iteration_logs):
+            continue
+        targets[(None, region)] = LogTarget(
+            profile=None,
+            region=region,
+            history_file=logs_dir / 'trade-executor-history.json',
+            deficit_file=deficit_file,
+            surplus_file=surplus_file,
+            base_log=None,
+            iteration_log_dir=region_dir,
+        )
+
+    return list(targets.values())
+
+
+def target_label(target):
+    """Human-readable name of a log target."""
+    if target.profile is None:
+        return target.region
+    return f"{target.profile} / {target.region}"
+
+
+def region_area_ids(target):
+    """
+    Collect area IDs belonging to the target's region, used to split the trade history that all regions
+    share (per profile, or `<logs_dir>/trade-executor-history.json` in the legacy layout).
+    Returns None when the region has neither deficit/surplus files nor a base log to take them from.
+    """
+    sources = [p for p in (target.deficit_file, target.surplus_file, target.base_log) if p is not None and p.exists()]
+    if not sources:
+        return None
+
+    area_ids = set()
+    for path in (target.deficit_file, target.surplus_file):
+        for info in load_remaining_file(path).values():
+            area_ids.update(area['AreaID'] for area in info['Areas'] if 'AreaID' in area)
+
+    if target.base_log is not None and target.base_log.exists():
+        region_field = f"region={target.region}"
+        with open(target.base_log, 'r', encoding='utf-8', errors='replace') as f:
+            for line in f:
+                if region_field not in line or '(id=' not in line:
+                    continue
+                match = REGION_FIELD_RE.search(line)
+                if match and match.group(1) == target.region:
+                    area_ids.update(int(i) for i in AREA_ID_RE.findall(line))
+
+    return area_ids
+
+
+def load_remaining_file(path):
+    """
+    Parse remaining-deficit.json / remaining-surplus.json as {goodId: {Total, Areas}}.
+    rxi/json.lua writes an empty table as `[]`, so a region with nothing left over is `{}` here too.
+    """
+    if not path.exists():
+        return {}
+    with open(path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    return data if isinstance(data, dict) else {}
+
+
 def load_goods_names(texts_file):
     """Load good names from texts.json."""
     with open(texts_file, 'r', encoding='utf-8') as f:
@@ -67,6 +183,34 @@ def parse_duration(duration_str):
     raise ValueError(f"Unknown time unit: {unit}")
 
 
+def parse_time_bound(value, now=None):
+    """
+    Parse a --from/--to bound into a local-timezone datetime.
+
+    Accepts 'now', a relative duration back from now ('15m', '-2h', '1d') or an absolute
+    local time ('2025-12-11T21:00', '2025-12-11 21:00:00', '21:00' for today).
+    """
+    local_tz = datetime.now().astimezone().tzinfo
+    now = now or datetime.now(local_tz)
+
+    value = value.strip()
+    if value.lower() == 'now':
+        return now
+
+    relative = value[1:] if value.startswith('-') else value
+    if re.match(r'^\d+[mhd]$', relative.lower()):
+        return now - parse_duration(relative)
+
+    if re.match(r'^\d{1,2}:\d{2}(:\d{2})?$', value):
+        parts = [int(p) for p in value.split(':')] + [0]
+        return now.replace(hour=parts[0], minute=parts[1], second=parts[2], microsecond=0)
+
+    try:
+        return parse_timestamp(value if value.endswith('Z') else value + 'Z')
+    except ValueError:
+        raise ValueError(f"Invalid time: {value}. Use 'now', '2h' (ago), '21:00' or '2025-12-11T21:00'")
+
+
 def get_display_width(text):
     """Get display width of text (excluding ANSI codes)."""
     import re
@@ -112,8 +256,9 @@ def format_trade_cell(received_amt, sent_amt, max_value):
     return "/".join(parts)
 
 
-def print_trade_table(received, sent):
-    """Print trades in a formatted table with UTF box drawing characters."""
+def format_trade_table(received, sent):
+    """Render trades as table lines with UTF box drawing characters."""
+    lines = []
     # Collect all goods and cities
     all_goods = set()
     all_cities = set()
@@ -127,7 +272,7 @@ def print_trade_table(received, sent):
         all_goods.update(goods.keys())
 
     if not all_goods or not all_cities:
-        return
+        return lines
 
     # Separate cities into c* and n* groups
     c_cities = [city for city in all_cities if city.startswith('c')]
@@ -178,38 +323,42 @@ def print_trade_table(received, sent):
             table_data.append(row)
 
     if not table_data:
-        return
+        return lines
+
+    return format_box_table(["Good/City"] + cities_list, table_data)
+
+
+def format_box_table(header, rows):
+    """Render a header and rows of (possibly ANSI-colored) cells as UTF box drawing lines."""
+    lines = []
 
     # Calculate column widths (accounting for ANSI codes)
-    col_widths = [len("Good/City")]
-    for city in cities_list:
-        col_widths.append(len(city))
+    col_widths = [len(h) for h in header]
 
-    for row in table_data:
+    for row in rows:
         for i, cell in enumerate(row):
             width = get_display_width(cell)
             if i < len(col_widths):
                 col_widths[i] = max(col_widths[i], width)
 
     # Print header
-    header = ["Good/City"] + cities_list
     header_row = "│ " + " │ ".join(
         header[i].ljust(col_widths[i]) for i in range(len(header))
     ) + " │"
 
     # Top border
     top_border = "┌─" + "─┬─".join("─" * col_widths[i] for i in range(len(col_widths))) + "─┐"
-    print(top_border)
+    lines.append(top_border)
 
     # Header
-    print(header_row)
+    lines.append(header_row)
 
     # Header separator
     header_sep = "├─" + "─┼─".join("─" * col_widths[i] for i in range(len(col_widths))) + "─┤"
-    print(header_sep)
+    lines.append(header_sep)
 
     # Data rows
-    for row_idx, row in enumerate(table_data):
+    for row in rows:
         cells = []
         for i, cell in enumerate(row):
             # Pad considering ANSI codes
@@ -217,23 +366,34 @@ def print_trade_table(received, sent):
             padding = col_widths[i] - display_width
             cells.append(cell + " " * padding)
 
-        print("│ " + " │ ".join(cells) + " │")
+        lines.append("│ " + " │ ".join(cells) + " │")
 
     # Bottom border
     bottom_border = "└─" + "─┴─".join("─" * col_widths[i] for i in range(len(col_widths))) + "─┘"
-    print(bottom_border)
+    lines.append(bottom_border)
 
+    return lines
+
+
+def print_trade_table(received, sent):
+    """Print trades in a formatted table with UTF box drawing characters."""
+    for line in format_trade_table(received, sent):
+        print(line)
 
-def analyze_trades(trades_file, texts_file, duration=None):
-    """Analyze trades and print overview per city."""
-    # Load goods names mapping
-    goods_names = load_goods_names(texts_file)
 
-    # Load trades
+def load_trades(trades_file, duration=None, time_from=None, time_to=None):
+    """Load trades, optionally keeping only those from the last `duration` or within [time_from, time_to).
+
+    Returns (trades, note) where note describes the applied filter (or None).
+    """
     with open(trades_file, 'r', encoding='utf-8') as f:
         trades = json.load(f)
 
-    # Filter trades by duration if specified
+    if not duration and time_from is None and time_to is None:
+        return trades, None
+
+    original_count = len(trades)
+
     if duration:
         # Get timezone from first trade if available
         if trades:
@@ -242,10 +402,18 @@ def analyze_trades(trades_file, texts_file, duration=None):
         else:
             cutoff_time = datetime.now() - duration
 
-        original_count = len(trades)
         trades = [t for t in trades if parse_timestamp(t['_start']) >= cutoff_time]
-        print(f"Filtered to trades from {cutoff_time} last {duration}: {len(trades)}/{original_count} trades\n")
+        return trades, f"Filtered to trades from {cutoff_time} last {duration}: {len(trades)}/{original_count} trades"
 
+    trades = [t for t in trades
+              if (time_from is None or parse_timestamp(t['_start']) >= time_from)
+              and (time_to is None or parse_timestamp(t['_start']) < time_to)]
+    return trades, (f"Filtered to trades from {time_from or '-'} to {time_to or '-'}: "
+                    f"{len(trades)}/{original_count} trades")
+
+
+def aggregate_trades(trades, goods_names):
+    """Aggregate trades into per-city received/sent amounts."""
     # Data structures to collect trade info
     # city -> good_id -> {amount: int, first_time: datetime, last_time: datetime}
     received = defaultdict(lambda: defaultdict(lambda: {'amount': 0, 'first_time': None, 'last_time': None}))
@@ -279,6 +447,20 @@ def analyze_trades(trades_file, texts_file, duration=None):
         if src_data['last_time'] is None or end_time > src_data['last_time']:
             src_data['last_time'] = end_time
 
+    return received, sent
+
+
+def analyze_trades(trades_file, texts_file, duration=None):
+    """Analyze trades and print overview per city."""
+    # Load goods names mapping
+    goods_names = load_goods_names(texts_file)
+
+    trades, note = load_trades(trades_file, duration)
+    if note:
+        print(note + "\n")
+
+    received, sent = aggregate_trades(trades, goods_names)
+
     # Print results as table
     print("\nTrade History:")
     print_trade_table(received, sent)
@@ -299,54 +481,136 @@ def sort_by_total_then_name(item):
     return (-data['total'], data['name'])
 
 
+def load_deficit_surplus_file(path, goods_names):
+    """Load remaining-deficit.json / remaining-surplus.json, empty if missing."""
+    data = {}
+    for good_id, info in load_remaining_file(path).items():
+        data[good_id] = {
+            'name': goods_names.get(good_id, f"Unknown({good_id})"),
+            'total': info['Total'],
+            'areas': [(area['AreaName'], area['Amount']) for area in info['Areas']]
+        }
+    return data
+
+
+def format_deficit_surplus(deficit_file, surplus_file, goods_names):
+    """Render deficit/surplus data as lines."""
+    lines = []
+
+    for title, path, color in (('deficit', deficit_file, Colors.RED), ('surplus', surplus_file, Colors.GREEN)):
+        data = load_deficit_surplus_file(path, goods_names)
+        if not data:
+            continue
+        lines.append(f"{title}:")
+        for good_id, item in sorted(data.items(), key=sort_by_total_then_name):
+            total_colored = f"{color}{item['total']}{Colors.RESET}"
+            areas_str = ", ".join([f"{area} @{color}{amt}{Colors.RESET}"
+                                   for area, amt in sorted(item['areas'])])
+            lines.append(f"  {item['name']}: {total_colored} ({areas_str})")
+        lines.append("")
+
+    return lines
+
+
 def analyze_deficit_surplus(deficit_file, surplus_file, texts_file):
     """Analyze and print deficit/surplus data."""
     goods_names = load_goods_names(texts_file)
+    for line in format_deficit_surplus(deficit_file, surplus_file, goods_names):
+        print(line)
+
+
+# Asset names shared by all pool workers; set once per worker by `_init_worker`.
+_worker_goods_names = {}
 
-    # Load deficit and surplus data
-    deficit_data = {}
-    surplus_data = {}
-
-    if deficit_file.exists():
-        with open(deficit_file, 'r', encoding='utf-8') as f:
-            raw_deficit = json.load(f)
-            for good_id, info in raw_deficit.items():
-                deficit_data[good_id] = {
-                    'name': goods_names.get(good_id, f"Unknown({good_id})"),
-                    'total': info['Total'],
-                    'areas': [(area['AreaName'], area['Amount']) for area in info['Areas']]
-                }
-
-    if surplus_file.exists():
-        with open(surplus_file, 'r', encoding='utf-8') as f:
-            raw_surplus = json.load(f)
-            for good_id, info in raw_surplus.items():
-                surplus_data[good_id] = {
-                    'name': goods_names.get(good_id, f"Unknown({good_id})"),
-                    'total': info['Total'],
-                    'areas': [(area['AreaName'], area['Amount']) for area in info['Areas']]
-                }
-
-    # Print deficit
-    if deficit_data:
-        print("deficit:")
-        sorted_deficit = sorted(deficit_data.items(), key=sort_by_total_then_name)
-        for good_id, data in sorted_deficit:
-            total_colored = f"{Colors.RED}{data['total']}{Colors.RESET}"
-            areas_str = ", ".join([f"{area} @{Colors.RED}{amt}{Colors.RESET}"
-                                   for area, amt in sorted(data['areas'])])
-            print(f"  {data['name']}: {total_colored} ({areas_str})")
-        print()
 
-    # Print surplus
-    if surplus_data:
-        print("surplus:")
-        sorted_surplus = sorted(surplus_data.items(), key=sort_by_total_then_name)
-        for good_id, data in sorted_surplus:
-            total_colored = f"{Colors.GREEN}{data['total']}{Colors.RESET}"
-            areas_str = ", ".join([f"{area} @{Colors.GREEN}{amt}{Colors.RESET}"
-                                   for area, amt in sorted(data['areas'])])
-            print(f"  {data['name']}: {total_colored} ({areas_str})")
+def _init_worker(goods_names):
+    global _worker_goods_names
+    _worker_goods_names = goods_names
+
+
+def analyze_target(target, duration=None, time_from=None, time_to=None, bucket=None, bucket_label=None):
+    """
+    Render the trade table and deficit/surplus of one log target (runs in a pool worker).
+    Errors are reported in the target's own block so that one broken region doesn't hide the others.
+    """
+    try:
+        return _analyze_target(target, duration, time_from, time_to, bucket, bucket_label or str(bucket))
+    except Exception as e:
+        return [f"{Colors.BOLD_RED}Error: {type(e).__name__}: {e}{Colors.RESET}"]
+
+
+def _analyze_target(target, duration, time_from, time_to, bucket, bucket_label):
+    goods_names = _worker_goods_names
+    lines = []
+
+    if target.history_file.exists():
+        if bucket:
+            # bucketing applies the window per direction itself (sent by start, received by end)
+            trades, note = load_trades(target.history_file)
+        else:
+            trades, note = load_trades(target.history_file, duration, time_from, time_to)
+        area_ids = region_area_ids(target)
+        if area_ids is not None:
+            trades = [t for t in trades if t.get('area_src') in area_ids or t.get('area_dst') in area_ids]
+        if note:
+            lines.append(note)
+        if bucket:
+            import numpy as np
+            from trade_query import TradeHistory, format_bucket_table
+            if duration:
+                time_from = datetime.now().astimezone() - duration
+            history = TradeHistory.from_records(trades, goods_names)
+            volumes = history.bucketed(bucket, time_from, time_to)
+            in_window = np.ones(len(history), dtype=bool)
+            if time_from is not None:
+                in_window &= history.start >= int(time_from.timestamp())
+            if time_to is not None:
+                in_window &= history.start < int(time_to.timestamp())
+            lines.append(f"Trade History per {bucket_label} ({int(in_window.sum())} trades):")
+            lines.extend(format_bucket_table(volumes, by='good'))
+            lines.append("")
+            lines.extend(format_bucket_table(volumes, by='city'))
+        else:
+            received, sent = aggregate_trades(trades, goods_names)
+            lines.append(f"Trade History ({len(trades)} trades):")
+            lines.extend(format_trade_table(received, sent))
+        lines.append("")
+
+    lines.extend(format_deficit_surplus(target.deficit_file, target.surplus_file, goods_names))
+    return lines
+
+
+def side_by_side(blocks, gap=4):
+    """Join blocks of lines horizontally, padding by display width (ANSI-aware)."""
+    widths = [max((get_display_width(line) for line in block), default=0) for block in blocks]
+    height = max((len(block) for block in blocks), default=0)
+    rows = []
+    for i in range(height):
+        cells = []
+        for block, width in zip(blocks, widths):
+            cell = block[i] if i < len(block) else ""
+            cells.append(cell + " " * (width - get_display_width(cell)))
+        rows.append((" " * gap).join(cells).rstrip())
+    return rows
+
+
+def print_combined_report(targets, results, stacked=False):
+    """Print per-region reports grouped by profile, regions side by side."""
+    by_profile = defaultdict(list)
+    for target, lines in zip(targets, results):
+        by_profile[target.profile].append((target, lines))
+
+    for profile, items in by_profile.items():
+        if profile is not None:
+            print(f"=== {profile} ===")
+        blocks = [[f"[{target.region}]", ""] + lines for target, lines in items]
+        if stacked:
+            for block in blocks:
+                for line in block:
+                    print(line)
+        else:
+            for line in side_by_side(blocks):
+                print(line)
         print()
 
 
@@ -354,6 +618,9 @@ def main():
     # note: the script assumes that `repo_root / 'anno-1800'` is a symlink to `<anno 1800 installation>/lua/` like
     # `anno-1800 -> '/data/games/steam/steamapps/common/Anno 1800/lua/'`
 
+    script_dir = Path(__file__).parent
+    repo_root = script_dir.parent
+
     parser = argparse.ArgumentParser(
         description='Analyze trade routes from JSON log file',
         formatter_class=argparse.RawDescriptionHelpFormatter,
@@ -363,6 +630,14 @@ Duration format examples:
   --duration 2h     Show trades from last 2 hours
   --duration 1d     Show trades from last 1 day
   (no flag)         Show all trades (default)
+
+Time window examples (instead of --duration):
+  --from 2h                 Trades started in the last 2 hours
+  --from 20:00 --to 22:00   Trades started between 20:00 and 22:00 today
+  --from 2025-12-11T20:00   Absolute local time
+  --bucket 1h               Per-hour volumes per good and city (requires numpy)
+
+Every profile/region found in --logs-dir is analyzed in parallel.
         '''
     )
     parser.add_argument(
@@ -370,27 +645,85 @@ Duration format examples:
         type=str,
         help="Filter trades from last duration (e.g., '15m', '2h', '1d')"
     )
+    parser.add_argument(
+        '--from',
+        dest='time_from',
+        type=str,
+        help="Start of the time window: 'now', relative ('2h') or absolute ('2025-12-11T20:00', '20:00')"
+    )
+    parser.add_argument(
+        '--to',
+        dest='time_to',
+        type=str,
+        help="End of the time window (same formats as --from)"
+    )
+    parser.add_argument(
+        '--bucket',
+        type=str,
+        help="Report volumes per time bucket (e.g. '5m', '1h')"
+    )
+    parser.add_argument(
+        '--logs-dir',
+        type=Path,
+        default=repo_root / 'anno-1800' / 'trade-route-automation',
+        help="Directory with TrRAt_<profile>_* files (or legacy per-region directories)"
+    )
+    parser.add_argument(
+        '--texts',
+        type=Path,
+        default=repo_root / 'anno-1800' / 'texts.json',
+        help="texts.json with good names"
+    )
+    parser.add_argument(
+        '--regions',
+        nargs='+',
+        help="Only analyze these regions (e.g. 'OW NW'); default: all discovered"
+    )
+    parser.add_argument(
+        '--jobs', '-j',
+        type=int,
+        default=None,
+        help="Number of worker processes (default: one per profile/region)"
+    )
+    parser.add_argument(
+        '--stacked',
+        action='store_true',
+        help="Print region reports one after another instead of side by side"
+    )
     args = parser.parse_args()
 
-    # Parse duration if provided
-    duration = None
-    if args.duration:
-        try:
+    # Parse duration / time window / bucket if provided
+    duration = time_from = time_to = bucket = None
+    try:
+        if args.duration:
             duration = parse_duration(args.duration)
-        except ValueError as e:
-            print(f"Error: {e}", file=sys.stderr)
-            sys.exit(1)
-
-    script_dir = Path(__file__).parent
-    repo_root = script_dir.parent
-    texts_file = repo_root / 'anno-1800' / 'texts.json'
-
-    trades_file = repo_root / 'anno-1800' / 'trade-route-automation' / 'trade-executor-history.json'
-    analyze_trades(trades_file, texts_file, duration)
+        if args.time_from:
+            time_from = parse_time_bound(args.time_from)
+        if args.time_to:
+            time_to = parse_time_bound(args.time_to)
+        if args.bucket:
+            bucket = parse_duration(args.bucket)
+    except ValueError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(1)
+    if duration and (time_from or time_to):
+        print("Error: --duration cannot be combined with --from/--to", file=sys.stderr)
+        sys.exit(1)
+
+    targets = discover_log_targets(args.logs_dir, args.regions)
+    if not targets:
+        print(f"Error: no trade automation logs found in {args.logs_dir}", file=sys.stderr)
+        sys.exit(1)
+
+    goods_names = load_goods_names(args.texts)
+    jobs = args.jobs or min(len(targets), os.cpu_count() or 1)
+    with ProcessPoolExecutor(max_workers=jobs, initializer=_init_worker, initargs=(goods_names,)) as pool:
+        n = len(targets)
+        results = list(pool.map(analyze_target, targets, [duration] * n, [time_from] * n, [time_to] * n, [bucket] * n,
+                                [args.bucket] * n))
+
+    print_combined_report(targets, results, args.stacked)
 
-    deficit_file = repo_root / 'anno-1800' / 'trade-route-automation' / 'OW' / 'remaining-deficit.json'
-    surplus_file = repo_root / 'anno-1800' / 'trade-route-automation' / 'OW' / 'remaining-surplus.json'
-    analyze_deficit_surplus(deficit_file, surplus_file, texts_file)
 
 if __name__ == '__main__':
     main()
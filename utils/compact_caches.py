@@ -0,0 +1,303 @@
+#!/usr/bin/env python3
+"""
+Inventory, validate and compact TrRAt_Cache_*.json files written by utils_cache.lua.
+Reports per-file size and an estimated rxi/json.lua decode cost before and after compaction.
+"""
+
+import argparse
+import json
+import re
+import sys
+from collections import defaultdict, namedtuple
+from pathlib import Path
+
+# Values stored by mod_map_scanner.lua (areaScanner_dfs) per packed "x,y" key
+NOT_ACCESSIBLE = 'not_accessible'
+SOMETHING_THERE = 'something_there'
+LAND = 'land'
+WATER = 'water'
+SCAN_VALUES = {NOT_ACCESSIBLE, SOMETHING_THERE, LAND, WATER}
+
+# Steps tried by mod_map_scanner_hl.lua (AreaScanStepsReversed); the first cached step with water points wins
+AREA_SCAN_STEPS = (15, 20, 30)
+
+# Function names as they appear in file names (utils_cache.lua makeFilenameSafe strips '.', '_', '(', ')')
+FUNC_AREA_SCAN = 'areaScannerdfs'
+FUNC_SESSION_SCAN = 'mapscannerSessionP11'
+
+# <base>TrRAt_Cache_<profile>_ + "_" + makeFilenameSafe('{"Func":...,"args":[...]}') + ".json"
+CACHE_FILE_RE = re.compile(r'^TrRAt_Cache_(?P<profile>.+?)__Func(?P<func>.+?)args_(?P<args>.*)_\.json$')
+# Whole-file caches (generator/products.lua, anno_interface.lua MapCaches)
+MAP_CACHE_FILE_RE = re.compile(r'^TrRAt_Cache_(?P<profile>.+?)_(?P<name>texts|product_info|factories_info\.t|residence_info'
+                               r'|ship_cargo_slot_capacity|ship_cargo_stack_limit)\.json$')
+REGION_ARGS_RE = re.compile(r'^(?P<region>[A-Z]{2})(?P<rest>.*)$')
+POINT_KEY_RE = re.compile(r'^-?\d+,-?\d+$')
+
+# json.lua parse() dispatch + table store, expressed in per-character loop iterations
+DECODE_COST_PER_VALUE = 10
+
+CacheFile = namedtuple('CacheFile', ['path', 'profile', 'func', 'region', 'area', 'step'])
+
+
+def parse_cache_file_name(path):
+    """Split a cache file name into profile, function and (for area scans) region/area/step."""
+    match = CACHE_FILE_RE.match(path.name)
+    if not match:
+        match = MAP_CACHE_FILE_RE.match(path.name)
+        if not match:
+            return None
+        return CacheFile(path, match.group('profile'), match.group('name') + '.json', None, None, None)
+
+    profile, func, args = match.group('profile'), match.group('func'), match.group('args')
+    region, area, step = None, None, None
+
+    # args are concatenated without separators: e.g. 'OW870620' = ("OW", 8706, 20), 'OWSassenberg20' = ("OW", "Sassenberg", "20")
+    args_match = REGION_ARGS_RE.match(args)
+    if args_match:
+        region = args_match.group('region')
+        rest = args_match.group('rest')
+        if func == FUNC_AREA_SCAN and len(rest) > 2 and rest[-2:].isdigit():
+            step = int(rest[-2:])
+            area = int(rest[:-2]) if rest[:-2].isdigit() else rest[:-2]
+
+    return CacheFile(path, profile, func, region, area, step)
+
+
+def count_values(value):
+    """Count JSON values (each one is a parse() call in json.lua)."""
+    if isinstance(value, dict):
+        return 1 + sum(1 + count_values(v) for v in value.values())
+    if isinstance(value, list):
+        return 1 + sum(count_values(v) for v in value)
+    return 1
+
+
+def estimate_decode_cost(text, value):
+    """
+    Rough json.lua decode cost: one loop iteration per character (strings, numbers and whitespace
+    are all scanned byte by byte) plus a fixed overhead per parsed value.
+    """
+    return len(text) + DECODE_COST_PER_VALUE * count_values(value)
+
+
+def encode_compact(value):
+    """Encode like json.lua does (sorted keys, no whitespace)."""
+    return json.dumps(value, sort_keys=True, separators=(',', ':'), ensure_ascii=False)
+
+
+def session_area_rectangles(session_scan):
+    """Port of sessionScanner_areaGrids: area ID -> (min_x, min_y, max_x, max_y)."""
+    rects = {}
+    for key, v in session_scan.items():
+        if v.get('city_index') == '.':
+            continue
+        x, y = (int(c) for c in key.split(','))
+        area_id = v['area_id']
+        if area_id in rects:
+            min_x, min_y, max_x, max_y = rects[area_id]
+            rects[area_id] = (min(min_x, x), min(min_y, y), max(max_x, x), max(max_y, y))
+        else:
+            rects[area_id] = (x, y, x, y)
+    return rects
+
+
+def validate_area_scan(scan):
+    """Return a list of problems found in an areaScanner_dfs cache."""
+    if not isinstance(scan, dict):
+        return [f"expected an object, got {type(scan).__name__}"]
+    problems = []
+    bad_keys = [k for k in scan if not POINT_KEY_RE.match(k)]
+    bad_values = [k for k, v in scan.items() if v not in SCAN_VALUES]
+    if bad_keys:
+        problems.append(f"{len(bad_keys)} malformed point keys (e.g. {bad_keys[0]!r})")
+    if bad_values:
+        problems.append(f"{len(bad_values)} unknown point values (e.g. {scan[bad_values[0]]!r})")
+    if not any(v == WATER for v in scan.values()):
+        problems.append("no water points (the mod skips this scan)")
+    return problems
+
+
+def validate_session_scan(scan):
+    """Return a list of problems found in a map_scanner.Session(P11) cache."""
+    if not isinstance(scan, dict):
+        return [f"expected an object, got {type(scan).__name__}"]
+    problems = []
+    bad_keys = [k for k in scan if not POINT_KEY_RE.match(k)]
+    bad_values = [k for k, v in scan.items()
+                  if not isinstance(v, dict) or 'area_id' not in v or 'city_index' not in v]
+    if bad_keys:
+        problems.append(f"{len(bad_keys)} malformed point keys (e.g. {bad_keys[0]!r})")
+    if bad_values:
+        problems.append(f"{len(bad_values)} malformed entries (e.g. {bad_values[0]!r})")
+    return problems
+
+
+def compact_area_scan(scan):
+    """
+    Drop invalid points. not_accessible points are kept: area_scan_*.tsv is regenerated from this cache
+    and they show where the DFS closed off the coast (see scan_quality.py).
+    """
+    return {k: v for k, v in scan.items() if POINT_KEY_RE.match(k) and v in SCAN_VALUES}
+
+
+def compact_session_scan(scan):
+    """Drop '.' (no city) points, which sessionScanner_areaGrids ignores."""
+    return {
+        k: v for k, v in scan.items()
+        if POINT_KEY_RE.match(k) and isinstance(v, dict) and v.get('city_index') != '.'
+    }
+
+
+def find_unused(files, scans):
+    """
+    Map cache path -> reason for area scans that are never read by the mod:
+    name-keyed copies written by ui_cmds.lua, and steps shadowed by a finer step with water points.
+    """
+    unused = {}
+    by_area = defaultdict(dict)
+    for cf in files:
+        if cf.func != FUNC_AREA_SCAN or cf.step is None:
+            continue
+        if not isinstance(cf.area, int):
+            unused[cf.path] = "name-keyed copy (the mod reads scans by area ID)"
+            continue
+        by_area[(cf.profile, cf.region, cf.area)][cf.step] = cf
+
+    for steps in by_area.values():
+        winner = None
+        for step in AREA_SCAN_STEPS:
+            cf = steps.get(step)
+            if cf is None:
+                continue
+            if winner is not None:
+                unused[cf.path] = f"shadowed by step={winner}"
+            elif isinstance(scans.get(cf.path), dict) and WATER in scans[cf.path].values():
+                winner = step
+    return unused
+
+
+def find_stale(files, scans):
+    """Map cache path -> reason for area scans of areas missing from the region's session scan."""
+    known_areas = {}
+    for cf in files:
+        if cf.func == FUNC_SESSION_SCAN and isinstance(scans.get(cf.path), dict):
+            known_areas[(cf.profile, cf.region)] = set(session_area_rectangles(compact_session_scan(scans[cf.path])))
+
+    stale = {}
+    for cf in files:
+        if cf.func != FUNC_AREA_SCAN or not isinstance(cf.area, int):
+            continue
+        areas = known_areas.get((cf.profile, cf.region))
+        if areas is not None and cf.area not in areas:
+            stale[cf.path] = f"area {cf.area} not in {cf.region} session scan"
+    return stale
+
+
+def format_size(n):
+    if n >= 1024 * 1024:
+        return f"{n / 1024 / 1024:.1f}M"
+    if n >= 1024:
+        return f"{n / 1024:.1f}K"
+    return f"{n}B"
+
+
+def main():
+    script_dir = Path(__file__).parent
+    repo_root = script_dir.parent
+
+    parser = argparse.ArgumentParser(
+        description='Inventory, validate and compact TrRAt_Cache_*.json files',
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog='''
+Without --write, only a report is printed.
+  --write           rewrite compacted caches in place
+  --write --prune   also delete unused (name-keyed, shadowed) and stale area scans
+        '''
+    )
+    parser.add_argument('--logs-dir', type=Path, default=repo_root / 'anno-1800' / 'trade-route-automation',
+                        help="Directory with TrRAt_Cache_* files")
+    parser.add_argument('--profile', help="Only process caches of this profile")
+    parser.add_argument('--write', action='store_true', help="Rewrite compacted caches")
+    parser.add_argument('--prune', action='store_true', help="With --write, delete unused and stale area scans")
+    args = parser.parse_args()
+
+    files = [cf for cf in (parse_cache_file_name(p) for p in sorted(args.logs_dir.glob('TrRAt_Cache_*.json')))
+             if cf is not None and (args.profile is None or cf.profile == args.profile)]
+    if not files:
+        print(f"Error: no cache files found in {args.logs_dir}", file=sys.stderr)
+        sys.exit(1)
+
+    texts, scans, problems = {}, {}, {}
+    for cf in files:
+        # getCityShortName (mod_map_scanner.lua) cuts city names bytewise, which can leave invalid UTF-8;
+        # surrogateescape round-trips those bytes unchanged
+        texts[cf.path] = cf.path.read_text(encoding='utf-8', errors='surrogateescape')
+        try:
+            scans[cf.path] = json.loads(texts[cf.path])
+        except ValueError as e:
+            problems[cf.path] = [f"invalid JSON: {e}"]
+            continue
+        if cf.func == FUNC_AREA_SCAN:
+            problems[cf.path] = validate_area_scan(scans[cf.path])
+        elif cf.func == FUNC_SESSION_SCAN:
+            problems[cf.path] = validate_session_scan(scans[cf.path])
+
+    unused = find_unused(files, scans)
+    stale = find_stale(files, scans)
+
+    total_before = total_after = cost_before_sum = cost_after_sum = 0
+    print(f"{'file':<72} {'size':>16} {'decode cost':>22}  notes")
+    for cf in files:
+        text = texts[cf.path]
+        name = cf.path.name[len('TrRAt_Cache_'):]
+        if cf.path not in scans:
+            print(f"{name:<72} {format_size(len(text)):>16} {'-':>22}  {'; '.join(problems[cf.path])}")
+            continue
+
+        value = scans[cf.path]
+        cost_before = estimate_decode_cost(text, value)
+        removed = args.prune and (cf.path in unused or cf.path in stale)
+        if removed:
+            compacted, new_text, cost_after = None, '', 0
+        else:
+            if cf.func == FUNC_AREA_SCAN and isinstance(value, dict):
+                compacted = compact_area_scan(value)
+            elif cf.func == FUNC_SESSION_SCAN and isinstance(value, dict):
+                compacted = compact_session_scan(value)
+            else:
+                compacted = value
+            new_text = encode_compact(compacted)
+            cost_after = estimate_decode_cost(new_text, compacted)
+
+        notes = list(problems.get(cf.path, []))
+        for reasons in (unused, stale):
+            if cf.path in reasons:
+                notes.append(reasons[cf.path])
+        if removed:
+            notes.append("deleted" if args.write else "would be deleted")
+
+        total_before += len(text)
+        total_after += len(new_text)
+        cost_before_sum += cost_before
+        cost_after_sum += cost_after
+        size_col = f"{format_size(len(text))} -> {format_size(len(new_text))}"
+        cost_col = f"{cost_before} -> {cost_after}"
+        print(f"{name:<72} {size_col:>16} {cost_col:>22}  {'; '.join(notes)}")
+
+        if args.write:
+            if removed:
+                cf.path.unlink()
+            elif new_text != text:
+                cf.path.write_text(new_text, encoding='utf-8', errors='surrogateescape')
+
+    print()
+    print(f"Total size: {format_size(total_before)} -> {format_size(total_after)}")
+    print(f"Total estimated decode cost: {cost_before_sum} -> {cost_after_sum}")
+    print(f"Unused area scans: {len(unused)}, stale area scans: {len(stale)}, "
+          f"files with problems: {sum(1 for p in problems.values() if p)}")
+    if not args.write:
+        print("Dry run, use --write to apply.")
+
+
+if __name__ == '__main__':
+    main()
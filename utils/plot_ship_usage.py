@@ -4,13 +4,21 @@ Plot ship usage and task spawning from trade execution logs.
 Shows 4 lines: ships available (regular/hub) and tasks spawned (regular/hub).
 """
 
+import argparse
+import os
 import re
+import sys
 from pathlib import Path
 from datetime import datetime
 from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+import matplotlib
+matplotlib.use('Agg')
 import matplotlib.pyplot as plt
 import matplotlib.dates as mdates
 
+from analyze_trades import REGION_FIELD_RE, discover_log_targets, side_by_side, target_label
+
 
 def parse_timestamp(ts_str):
     """Parse ISO timestamp string to datetime (treat Z as local timezone)."""
@@ -45,6 +53,68 @@ def parse_log_file(log_path):
     }
 
 
+def parse_base_log(base_log, region):
+    """
+    Parse TrRAt_<profile>_base.log and extract ships available and tasks spawned per iteration of `region`.
+    Returns (regular_logs, hub_logs), same records as `parse_log_file`.
+    """
+    iterations = {}
+    region_field = f"region={region}"
+
+    with open(base_log, 'r', encoding='utf-8', errors='replace') as f:
+        for line in f:
+            if region_field not in line or 'iteration=' not in line:
+                continue
+            ships_match = re.search(r'Total available trade route automation ships:\s*(\d+)', line)
+            tasks_match = re.search(r'Spawned\s+(\d+)\s+async tasks for trade route execution', line)
+            if not ships_match and not tasks_match:
+                continue
+            region_match = REGION_FIELD_RE.search(line)
+            type_match = re.search(r'\btype=(regular|hub)\b', line)
+            iteration_match = re.search(r'\biteration=(\d+)', line)
+            if not region_match or region_match.group(1) != region or not type_match or not iteration_match:
+                continue
+
+            key = (type_match.group(1), iteration_match.group(1))
+            data = iterations.get(key)
+            if data is None:
+                timestamp_match = re.match(r'(\d{4}-\d{2}-\d{2}T\d{2}:\d{2}:\d{2}Z)', line)
+                data = iterations[key] = {
+                    'timestamp': parse_timestamp(timestamp_match.group(1)) if timestamp_match else None,
+                    'ships_available': None,
+                    'tasks_spawned': 0,
+                }
+            if ships_match:
+                data['ships_available'] = int(ships_match.group(1))
+            if tasks_match:
+                data['tasks_spawned'] = int(tasks_match.group(1))
+
+    regular_logs, hub_logs = [], []
+    for (trade_type, _), data in sorted(iterations.items(), key=lambda kv: kv[1]['timestamp'] or datetime.min):
+        if data['timestamp'] is None or data['ships_available'] is None:
+            continue
+        (hub_logs if trade_type == 'hub' else regular_logs).append(data)
+    return regular_logs, hub_logs
+
+
+def parse_iteration_logs(log_dir):
+    """Parse legacy per-iteration log files (trade-execute-iteration.*.log[.hub]) in `log_dir`."""
+    regular_logs = []
+    hub_logs = []
+
+    for log_file in sorted(Path(log_dir).glob('trade-execute-iteration.*.log*')):
+        if log_file.name.endswith('.log.hub'):
+            data = parse_log_file(log_file)
+            if data['timestamp']:
+                hub_logs.append(data)
+        elif log_file.name.endswith('.log'):
+            data = parse_log_file(log_file)
+            if data['timestamp']:
+                regular_logs.append(data)
+
+    return regular_logs, hub_logs
+
+
 def moving_average(values, window_size):
     """Calculate moving average with given window size."""
     if len(values) < window_size:
@@ -66,25 +136,18 @@ def plot_ship_usage(log_dir, output_file='ship_usage.png', moving_avg_window=10)
         output_file: Output PNG filename
         moving_avg_window: Window size for moving average (number of data points)
     """
-    log_dir = Path(log_dir)
+    regular_logs, hub_logs = parse_iteration_logs(log_dir)
+    for line in plot_usage(regular_logs, hub_logs, output_file, moving_avg_window):
+        print(line)
 
-    # Parse all log files
-    regular_logs = []
-    hub_logs = []
 
-    for log_file in sorted(log_dir.glob('trade-execute-iteration.*.log*')):
-        if log_file.name.endswith('.log.hub'):
-            data = parse_log_file(log_file)
-            if data['timestamp']:
-                hub_logs.append(data)
-        elif log_file.name.endswith('.log'):
-            data = parse_log_file(log_file)
-            if data['timestamp']:
-                regular_logs.append(data)
+def plot_usage(regular_logs, hub_logs, output_file, moving_avg_window=10, title_suffix=''):
+    """Plot parsed iterations to `output_file`; returns the summary as lines."""
+    lines = []
 
     if not regular_logs and not hub_logs:
-        print("No log files found with valid data.")
-        return
+        lines.append("No log files found with valid data.")
+        return lines
 
     # Extract data for plotting
     regular_times = [log['timestamp'] for log in regular_logs]
@@ -132,7 +195,7 @@ def plot_ship_usage(log_dir, output_file='ship_usage.png', moving_avg_window=10)
     # Format plot
     ax.set_xlabel('Time', fontsize=12, fontweight='bold')
     ax.set_ylabel('Number of Ships/Tasks', fontsize=12, fontweight='bold')
-    ax.set_title('Trade Route Automation: Ship Availability & Task Spawning',
+    ax.set_title('Trade Route Automation: Ship Availability & Task Spawning' + title_suffix,
                  fontsize=14, fontweight='bold', pad=20)
     ax.legend(loc='best', fontsize=10, framealpha=0.9)
     ax.grid(True, alpha=0.3, linestyle='--')
@@ -150,33 +213,75 @@ def plot_ship_usage(log_dir, output_file='ship_usage.png', moving_avg_window=10)
 
     # Save to file with higher DPI for better zoom quality
     plt.savefig(output_file, dpi=200, bbox_inches='tight')
-    print(f"Plot saved to: {output_file}")
-    print(f"  Moving average window: {moving_avg_window} data points")
+    plt.close(fig)
+    lines.append(f"Plot saved to: {output_file}")
+    lines.append(f"  Moving average window: {moving_avg_window} data points")
 
-    # Print summary statistics
-    print("\nSummary:")
+    # Summary statistics
+    lines.append("")
+    lines.append("Summary:")
     if regular_logs:
         avg_regular_ships = sum(regular_ships) / len(regular_ships)
         avg_regular_tasks = sum(regular_tasks) / len(regular_tasks)
-        print(f"  Regular trades: {len(regular_logs)} iterations")
-        print(f"    Avg ships available: {avg_regular_ships:.1f}")
-        print(f"    Avg tasks spawned: {avg_regular_tasks:.1f}")
+        lines.append(f"  Regular trades: {len(regular_logs)} iterations")
+        lines.append(f"    Avg ships available: {avg_regular_ships:.1f}")
+        lines.append(f"    Avg tasks spawned: {avg_regular_tasks:.1f}")
 
     if hub_logs:
         avg_hub_ships = sum(hub_ships) / len(hub_ships)
         avg_hub_tasks = sum(hub_tasks) / len(hub_tasks)
-        print(f"  Hub trades: {len(hub_logs)} iterations")
-        print(f"    Avg ships available: {avg_hub_ships:.1f}")
-        print(f"    Avg tasks spawned: {avg_hub_tasks:.1f}")
+        lines.append(f"  Hub trades: {len(hub_logs)} iterations")
+        lines.append(f"    Avg ships available: {avg_hub_ships:.1f}")
+        lines.append(f"    Avg tasks spawned: {avg_hub_tasks:.1f}")
+
+    return lines
+
+
+def plot_target(target, output_dir, moving_avg_window=10):
+    """Parse and plot one profile/region (runs in a pool worker)."""
+    if target.base_log is not None:
+        if not target.base_log.exists():
+            return [f"{target.base_log} does not exist"]
+        regular_logs, hub_logs = parse_base_log(target.base_log, target.region)
+        name = f"ship_usage_{target.profile}_{target.region}.png"
+    else:
+        regular_logs, hub_logs = parse_iteration_logs(target.iteration_log_dir)
+        name = f"ship_usage_{target.region}.png"
+
+    return plot_usage(regular_logs, hub_logs, Path(output_dir) / name, moving_avg_window,
+                      title_suffix=f" ({target_label(target)})")
 
 
 def main():
     script_dir = Path(__file__).parent
     repo_root = script_dir.parent
-    log_dir = repo_root / 'anno-1800' / 'trade-route-automation' / 'OW'
-    output_file = repo_root / 'ship_usage.png'
 
-    plot_ship_usage(log_dir, output_file)
+    parser = argparse.ArgumentParser(description='Plot ship usage for every profile/region in parallel')
+    parser.add_argument('--logs-dir', type=Path, default=repo_root / 'anno-1800' / 'trade-route-automation',
+                        help="Directory with TrRAt_<profile>_* files (or legacy per-region directories)")
+    parser.add_argument('--regions', nargs='+',
+                        help="Only plot these regions (e.g. 'OW NW'); default: all discovered")
+    parser.add_argument('--output-dir', type=Path, default=repo_root,
+                        help="Directory for ship_usage_*.png files")
+    parser.add_argument('--window', type=int, default=10,
+                        help="Moving average window (number of data points)")
+    parser.add_argument('--jobs', '-j', type=int, default=None,
+                        help="Number of worker processes (default: one per profile/region)")
+    args = parser.parse_args()
+
+    targets = discover_log_targets(args.logs_dir, args.regions)
+    if not targets:
+        print(f"Error: no trade automation logs found in {args.logs_dir}", file=sys.stderr)
+        sys.exit(1)
+
+    jobs = args.jobs or min(len(targets), os.cpu_count() or 1)
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        results = list(pool.map(plot_target, targets, [args.output_dir] * len(targets),
+                                [args.window] * len(targets)))
+
+    blocks = [[f"[{target_label(target)}]"] + lines for target, lines in zip(targets, results)]
+    for line in side_by_side(blocks):
+        print(line)
 
 
 if __name__ == '__main__':
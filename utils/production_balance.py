@@ -0,0 +1,298 @@
+#!/usr/bin/env python3
+"""
+Production-chain balance per region: which remaining deficits are structural (more ships won't help)
+and which are transient (goods exist elsewhere in the region and are just not delivered yet).
+
+Consumers come from the scanned production/residence GUIDs (TrRAt_Cache_*AnnoAreasTo*Guids*) combined
+with generator/factories_info.t.json and residence_info.json. The generator data has no production
+outputs or rates, so supply is observed: goods shipped out in the trade history window plus what is
+left in remaining-surplus.json. Consumption per building type is calibrated from what consumers
+received plus what they still lack; an area's net rate compares its share of the supply elsewhere in
+the region with its demand.
+"""
+
+import argparse
+import json
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+from scipy import sparse
+
+from analyze_trades import Colors, discover_log_targets, load_goods_names, load_trades, parse_duration, target_label
+from trade_query import to_epoch_seconds
+
+# Verdicts, ordered by how much more ships would help
+NO_SOURCE = 'no source'
+UNDER_PRODUCED = 'under-produced'
+TRANSIENT = 'transient'
+
+
+class Index:
+    """Dense integer IDs for GUIDs / area IDs."""
+
+    def __init__(self):
+        self.ids = {}
+        self.keys = []
+
+    def __call__(self, key):
+        key = int(key)
+        i = self.ids.get(key)
+        if i is None:
+            i = self.ids[key] = len(self.keys)
+            self.keys.append(key)
+        return i
+
+    def __len__(self):
+        return len(self.keys)
+
+
+def load_json(path, default=None):
+    if path is None or not path.exists():
+        return default
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def load_building_info(factories_file, residences_file):
+    """Return building GUID -> consumed goods with weights."""
+    buildings = {}
+    factories = load_json(factories_file, {})
+    for info in (factories.values() if isinstance(factories, dict) else factories):
+        buildings[int(info['Guid'])] = [(int(c['Guid']), float(c.get('Value') or 1))
+                                        for c in info.get('Consumption', [])]
+    for info in load_json(residences_file, {}).values():
+        buildings[int(info['Guid'])] = [(int(g), 1.0) for g in info.get('Request', {})]
+    return buildings
+
+
+def cache_file(logs_dir, profile, func, region):
+    return Path(logs_dir) / f"TrRAt_Cache_{profile}__Func{func}args_{region}_.json"
+
+
+class RegionBalance:
+    """Sparse area x good matrices for one region."""
+
+    def __init__(self, areas, goods, demand, surplus, deficit, inflow, outflow, hours):
+        self.areas = areas
+        self.goods = goods
+        self.demand = demand          # consumer building types per area/good (weighted by consumption)
+        self.surplus = surplus        # remaining surplus amount
+        self.deficit = deficit        # remaining deficit amount
+        self.inflow = inflow          # received per hour over the history window
+        self.outflow = outflow        # sent per hour over the history window
+        self.hours = hours
+
+    @classmethod
+    def build(cls, target, buildings, history_window=None):
+        areas, goods = Index(), Index()
+        area_names = {}
+
+        def entries(path):
+            rows, cols, vals = [], [], []
+            for good, info in (load_json(path, {}) or {}).items():
+                for area in info['Areas']:
+                    if 'AreaID' not in area:
+                        continue
+                    area_names[int(area['AreaID'])] = area['AreaName']
+                    rows.append(areas(area['AreaID']))
+                    cols.append(goods(good))
+                    vals.append(area['Amount'])
+            return rows, cols, vals
+
+        deficit_e = entries(target.deficit_file)
+        surplus_e = entries(target.surplus_file)
+
+        # area x building incidence from the scanned GUID caches
+        a_rows, a_cols, building_ids = [], [], Index()
+        if target.profile is not None:
+            logs_dir = target.deficit_file.parent
+            for func in ('AnnoAreasToProductionGuids', 'AnnoAreasToResidenceGuids'):
+                scanned = load_json(cache_file(logs_dir, target.profile, func, target.region), {}) or {}
+                for area_id, guids in scanned.items():
+                    for guid in guids:
+                        if int(guid) in buildings:
+                            a_rows.append(areas(area_id))
+                            a_cols.append(building_ids(guid))
+
+        c_rows, c_cols, c_vals = [], [], []
+        for b, guid in enumerate(building_ids.keys):
+            for good, value in buildings[guid]:
+                c_rows.append(b)
+                c_cols.append(goods(good))
+                c_vals.append(value)
+
+        # trade history flows per area/good
+        trades = []
+        if target.history_file.exists():
+            trades, _ = load_trades(target.history_file, history_window)
+            known = set(areas.ids)
+            trades = [t for t in trades if t.get('area_src') in known or t.get('area_dst') in known]
+        for t in trades:
+            area_names.setdefault(t['area_src'], t['area_src_name'])
+            area_names.setdefault(t['area_dst'], t['area_dst_name'])
+        src = [areas(t['area_src']) for t in trades]
+        dst = [areas(t['area_dst']) for t in trades]
+        tg = [goods(t['good_id']) for t in trades]
+        amount = [t['good_amount'] for t in trades]
+        if history_window:
+            hours = history_window.total_seconds() / 3600
+        elif trades:
+            ts = to_epoch_seconds([t['_start'] for t in trades])
+            hours = max((ts.max() - ts.min()) / 3600, 1 / 60)
+        else:
+            hours = 1.0
+
+        shape = (len(areas), len(goods))
+        incidence = sparse.csr_matrix((np.ones(len(a_rows)), (a_rows, a_cols)), shape=(len(areas), len(building_ids)))
+        consumption = sparse.csr_matrix((c_vals, (c_rows, c_cols)), shape=(len(building_ids), len(goods)))
+
+        def matrix(rows, cols, vals):
+            return sparse.csr_matrix((np.asarray(vals, dtype=np.float64), (rows, cols)), shape=shape)
+
+        balance = cls(
+            areas=areas,
+            goods=goods,
+            demand=incidence @ consumption,
+            surplus=matrix(*surplus_e),
+            deficit=matrix(*deficit_e),
+            inflow=matrix(dst, tg, amount) / hours,
+            outflow=matrix(src, tg, amount) / hours,
+            hours=hours,
+        )
+        balance.area_names = area_names
+        return balance
+
+    def rates(self):
+        """
+        Per (area, good) rates per hour, as dense arrays:
+          needed     observed consumption (inflow + deficit spread over the window), or the area's demand
+                     weight times the region's calibrated per-building-type rate, whichever is larger
+          elsewhere  supply from the other areas of the region: their outflow + surplus spread over the window
+          net        the area's demand-weighted share of `elsewhere` minus `needed`
+        """
+        deficit = self.deficit.toarray() / self.hours
+        surplus = self.surplus.toarray() / self.hours
+        inflow = self.inflow.toarray()
+        outflow = self.outflow.toarray()
+        demand = self.demand.toarray()
+
+        observed = inflow + deficit
+        weight = demand.sum(axis=0)
+        per_weight = np.divide((observed * (demand > 0)).sum(axis=0), weight,
+                               out=np.zeros_like(weight), where=weight > 0)
+        needed = np.maximum(observed, demand * per_weight)
+
+        own_supply = outflow + surplus
+        elsewhere = own_supply.sum(axis=0) - own_supply
+        total_needed = needed.sum(axis=0)
+        share = np.divide(needed, total_needed, out=np.zeros_like(needed), where=total_needed > 0)
+        return needed, elsewhere, elsewhere * share - needed
+
+    def classify(self):
+        """
+        Classify every remaining deficit (area, good) by its net rate:
+          transient       its share of the supply elsewhere in the region covers its demand; ships can deliver it
+          under-produced  other areas supply the good, but not enough for this area's demand
+          no source       no other area of the region ships the good or has surplus of it
+        Returns (area_idx, good_idx, amount, net rate per hour, verdict) arrays.
+        """
+        deficit = self.deficit.tocoo()
+        rows, cols, amounts = deficit.row, deficit.col, deficit.data
+
+        _, elsewhere, net = self.rates()
+        net = net[rows, cols]
+        verdict = np.select(
+            [elsewhere[rows, cols] <= 0, net < 0],
+            [NO_SOURCE, UNDER_PRODUCED],
+            default=TRANSIENT,
+        )
+        return rows, cols, amounts, net, verdict
+
+
+def format_report(balance, goods_names, verbose=False):
+    """Render deficit verdicts as lines."""
+    rows, cols, amounts, net, verdict = balance.classify()
+    consumers = np.asarray((balance.demand > 0).sum(axis=0)).ravel()
+    region_surplus = np.asarray(balance.surplus.sum(axis=0)).ravel()
+    inflow = balance.inflow.tocsr()
+
+    colors = {NO_SOURCE: Colors.BOLD_RED, UNDER_PRODUCED: Colors.RED, TRANSIENT: Colors.GREEN}
+    lines = []
+    order = sorted(range(len(rows)), key=lambda i: (verdict[i] == TRANSIENT, verdict[i] == UNDER_PRODUCED,
+                                                      -amounts[i]))
+    for i in order:
+        if not verbose and verdict[i] == TRANSIENT:
+            continue
+        good = balance.goods.keys[cols[i]]
+        area = balance.areas.keys[rows[i]]
+        name = goods_names.get(str(good), f"Unknown({good})")
+        area_name = balance.area_names.get(area, str(area))
+        lines.append(f"  {colors[verdict[i]]}{verdict[i]:<14}{Colors.RESET} {name} @ {area_name}: "
+                     f"deficit={int(amounts[i])} region surplus={int(region_surplus[cols[i]])} "
+                     f"consumer areas={int(consumers[cols[i]])} inflow={inflow[rows[i], cols[i]]:.0f}/h "
+                     f"net={net[i]:+.0f}/h")
+
+    counts = {v: int((verdict == v).sum()) for v in (NO_SOURCE, UNDER_PRODUCED, TRANSIENT)}
+    lines.append(f"  structural: {counts[NO_SOURCE] + counts[UNDER_PRODUCED]} "
+                 f"({counts[NO_SOURCE]} no source, {counts[UNDER_PRODUCED]} under-produced), "
+                 f"transient: {counts[TRANSIENT]}")
+    if counts[TRANSIENT] == 0 and len(rows):
+        lines.append("  adding ships won't help: every deficit is structural")
+    return lines
+
+
+def main():
+    script_dir = Path(__file__).parent
+    repo_root = script_dir.parent
+    generator_dir = repo_root / 'trade_route_automation' / 'generator'
+
+    parser = argparse.ArgumentParser(description='Classify remaining deficits as structural or transient')
+    parser.add_argument('--logs-dir', type=Path, default=repo_root / 'anno-1800' / 'trade-route-automation',
+                        help="Directory with TrRAt_<profile>_* and TrRAt_Cache_* files")
+    parser.add_argument('--regions', nargs='+', help="Only these regions (e.g. 'OW NW')")
+    parser.add_argument('--window', type=str, default='1h',
+                        help="Trade history window for flow rates (e.g. '30m', '2h'); default 1h")
+    parser.add_argument('--factories', type=Path, default=generator_dir / 'factories_info.t.json')
+    parser.add_argument('--residences', type=Path, default=generator_dir / 'residence_info.json')
+    parser.add_argument('--texts', type=Path, default=repo_root / 'anno-1800' / 'texts.json')
+    parser.add_argument('--verbose', '-v', action='store_true', help="Also list transient deficits")
+    parser.add_argument('--watch', type=int, metavar='SECONDS', help="Re-evaluate every SECONDS")
+    args = parser.parse_args()
+
+    try:
+        window = parse_duration(args.window)
+    except ValueError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(1)
+
+    goods_names = load_goods_names(args.texts) if args.texts.exists() else {}
+    buildings = load_building_info(args.factories, args.residences)
+
+    while True:
+        targets = discover_log_targets(args.logs_dir, args.regions)
+        if not targets:
+            print(f"Error: no trade automation logs found in {args.logs_dir}", file=sys.stderr)
+            sys.exit(1)
+
+        for target in targets:
+            started = time.perf_counter()
+            balance = RegionBalance.build(target, buildings, window)
+            lines = format_report(balance, goods_names, args.verbose)
+            elapsed = (time.perf_counter() - started) * 1000
+            print(f"[{target_label(target)}] {len(balance.areas)} areas, {len(balance.goods)} goods "
+                  f"({elapsed:.1f} ms)")
+            for line in lines:
+                print(line)
+            print()
+
+        if not args.watch:
+            break
+        time.sleep(args.watch)
+        print(f"--- {datetime.now():%H:%M:%S} ---")
+
+
+if __name__ == '__main__':
+    main()
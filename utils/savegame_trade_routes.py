@@ -0,0 +1,213 @@
+#!/usr/bin/env python3
+"""
+Extract trade routes from an exported savegame XML (FileDBReader export).
+Streams the file with iterparse, so multi-hundred-MB exports are never fully loaded.
+See docs/lua-inspector/savefile-tradeRoute-sample.md for the route layout.
+"""
+
+import argparse
+import json
+import sys
+import xml.etree.ElementTree as ET
+from collections import defaultdict
+from pathlib import Path
+
+from analyze_trades import load_goods_names
+
+
+# Route fields read by parse_route that can precede <Stations>; every other leaf outside a route is dropped
+ROUTE_FIELDS = {'ID', 'FolderID', 'Name', 'Ships', 'LostShips'}
+
+
+def load_product_names(product_info_file):
+    """Load GUID -> name mapping from generator/product_info.json."""
+    with open(product_info_file, 'r', encoding='utf-8') as f:
+        product_info = json.load(f)
+    return {guid: info['Name'] for guid, info in product_info.items()}
+
+
+def parse_int(text):
+    """Parse a decimal integer field, returns None if missing."""
+    if text is None or not text.strip():
+        return None
+    return int(text)
+
+
+def parse_hex_le(text):
+    """Parse a hex-encoded little-endian integer field like '02000000' (= 2)."""
+    if text is None or not text.strip():
+        return None
+    return int.from_bytes(bytes.fromhex(text.strip()), 'little')
+
+
+def parse_flag(text):
+    """Parse a hex-encoded boolean field like '01'; None if the field is absent."""
+    value = parse_hex_le(text)
+    return None if value is None else value != 0
+
+
+def parse_route(elem, names):
+    """Convert a trade route element into a compact record."""
+    ships = (elem.findtext('Ships') or '').split()
+    lost_ships = (elem.findtext('LostShips') or '').split()
+
+    stations = []
+    for station in elem.find('Stations'):
+        goods = []
+        good_infos = station.find('GoodInfos')
+        for good in (good_infos if good_infos is not None else []):
+            guid = parse_int(good.findtext('ProductGUID'))
+            goods.append({
+                'guid': guid,
+                'name': names.get(str(guid), f"Unknown({guid})"),
+                'amount': parse_int(good.findtext('Amount')),
+                'loading': parse_flag(good.findtext('IsLoading')),
+                'index': parse_hex_le(good.findtext('Index')) or 0,
+            })
+        stations.append({
+            'station_id': parse_int(station.findtext('StationID')),
+            'area_id': parse_int(station.findtext('AreaID')),
+            'goods': goods,
+        })
+
+    return {
+        'id': parse_int(elem.findtext('ID')),
+        'folder_id': parse_int(elem.findtext('FolderID')),
+        'name': elem.findtext('Name'),
+        'ships': [int(s) for s in ships],
+        'lost_ships': [int(s) for s in lost_ships],
+        'stations': stations,
+    }
+
+
+def iter_trade_routes(xml_file, names):
+    """
+    Yield compact trade route records from a savegame XML export.
+
+    A trade route is any element that has a <Stations> child. Elements outside of a route are
+    cleared and detached from their parent as soon as they end, except for leaves named like route
+    fields (ROUTE_FIELDS), which are kept until their parent ends in case it turns out to be a route.
+    """
+    stack = []
+    route_depth = None
+
+    for event, elem in ET.iterparse(xml_file, events=('start', 'end')):
+        if event == 'start':
+            stack.append(elem)
+            # <Stations> marks its parent as a trade route; keep that subtree until the route ends
+            if elem.tag == 'Stations' and route_depth is None and len(stack) >= 2:
+                route_depth = len(stack) - 2
+            continue
+
+        depth = len(stack) - 1
+        stack.pop()
+        parent = stack[-1] if stack else None
+
+        if route_depth is not None:
+            if depth > route_depth:
+                continue
+            route_depth = None
+            yield parse_route(elem, names)
+        elif len(elem) == 0 and elem.tag in ROUTE_FIELDS:
+            # may belong to a route whose <Stations> has not been seen yet
+            continue
+
+        elem.clear()
+        if parent is not None:
+            parent.remove(elem)
+
+
+def print_summary(routes):
+    """Print a short per-route overview."""
+    for route in routes:
+        areas = " -> ".join(str(s['area_id']) for s in route['stations'])
+        goods = sorted({g['name'] for s in route['stations'] for g in s['goods']})
+        print(f"  [{route['id']}] {route['name']}: {len(route['ships'])} ships; {areas}")
+        if goods:
+            print(f"      goods: {', '.join(goods)}")
+
+
+def compare_with_history(routes, history_file, names):
+    """Print (area, good) pairs served by both manual routes and the automation."""
+    with open(history_file, 'r', encoding='utf-8') as f:
+        trades = json.load(f)
+
+    automated = defaultdict(int)
+    area_names = {}
+    for trade in trades:
+        good = str(trade['good_id'])
+        automated[(trade['area_src'], good)] += trade['good_amount']
+        automated[(trade['area_dst'], good)] += trade['good_amount']
+        area_names[trade['area_src']] = trade['area_src_name']
+        area_names[trade['area_dst']] = trade['area_dst_name']
+
+    overlaps = defaultdict(list)
+    for route in routes:
+        for station in route['stations']:
+            for good in station['goods']:
+                key = (station['area_id'], str(good['guid']))
+                if key in automated:
+                    overlaps[key].append(route['name'])
+
+    if not overlaps:
+        print("No overlap between manual trade routes and automated trades.")
+        return
+
+    print("Goods moved by both manual trade routes and the automation:")
+    for (area_id, good), route_names in sorted(overlaps.items(), key=lambda kv: -automated[kv[0]]):
+        area = area_names.get(area_id, str(area_id))
+        good_name = names.get(good, f"Unknown({good})")
+        print(f"  {area} / {good_name}: automated={automated[(area_id, good)]} "
+              f"routes={', '.join(sorted(set(route_names)))}")
+
+
+def main():
+    script_dir = Path(__file__).parent
+    repo_root = script_dir.parent
+
+    parser = argparse.ArgumentParser(description='Extract trade routes from an exported savegame XML')
+    parser.add_argument('savegame', type=Path, help='Savegame XML export (FileDBReader)')
+    parser.add_argument('--output', '-o', type=Path,
+                        help='Write one JSON record per trade route to this file (JSON lines)')
+    parser.add_argument('--texts', type=Path, default=repo_root / 'anno-1800' / 'texts.json',
+                        help='texts.json used to resolve product GUIDs')
+    parser.add_argument('--product-info', type=Path,
+                        default=repo_root / 'trade_route_automation' / 'generator' / 'product_info.json',
+                        help='product_info.json used to resolve product GUIDs missing from texts.json')
+    parser.add_argument('--history', type=Path,
+                        help='trade-executor-history.json to compare the routes against')
+    args = parser.parse_args()
+
+    if not args.savegame.exists():
+        print(f"Error: {args.savegame} does not exist", file=sys.stderr)
+        sys.exit(1)
+
+    names = {}
+    if args.product_info.exists():
+        names.update(load_product_names(args.product_info))
+    if args.texts.exists():
+        names.update(load_goods_names(args.texts))
+
+    routes = []
+    out = open(args.output, 'w', encoding='utf-8') if args.output else None
+    try:
+        for route in iter_trade_routes(args.savegame, names):
+            routes.append(route)
+            if out:
+                out.write(json.dumps(route, ensure_ascii=False, separators=(',', ':')) + '\n')
+    finally:
+        if out:
+            out.close()
+
+    print(f"Trade routes: {len(routes)}")
+    print_summary(routes)
+    if args.output:
+        print(f"\nRecords written to: {args.output}")
+
+    if args.history:
+        print()
+        compare_with_history(routes, args.history, names)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,266 @@
+#!/usr/bin/env python3
+"""
+Check area scans (TrRAt_<profile>_area_scan_<City>.tsv) for the problems that make ships get stuck:
+water access points that cannot be reached from open sea, unfinished scans (areaScanner_dfs gives up
+after 200 invocations), holes and parts of the area rectangle the scan never reached.
+
+Each scan is rasterized on its own grid step and labelled with scipy.ndimage; see
+utils/area-visualizer-examples/bugged.png for what a failing scan looks like.
+"""
+
+import argparse
+import json
+import re
+import sys
+import time
+from collections import namedtuple
+from functools import reduce
+from math import gcd
+from pathlib import Path
+
+import numpy as np
+from scipy import ndimage
+
+from analyze_trades import REGION_FIELD_RE
+from compact_caches import FUNC_SESSION_SCAN, parse_cache_file_name, session_area_rectangles
+
+AREA_SCAN_FILE_RE = re.compile(r'^TrRAt_(?P<profile>.+?)_area_scan_(?P<city>.+?)(?P<hub>_\(h\))?\.tsv$')
+
+# Raster cell values; letters as written by map_scanner.Coordinate_ToLetter
+UNSCANNED, NOT_ACCESSIBLE, LAND, SOMETHING_THERE, WATER = range(5)
+LETTER_CODES = {'N': NOT_ACCESSIBLE, 'L': LAND, 'S': SOMETHING_THERE, 'W': WATER}
+ACCESS_POINT = 'w'
+
+# map_scanner.lua P11 preset grid spacing; session rectangles are only this precise
+P11_DELTA_X = 90
+P11_DELTA_Y = 50
+
+# A few open coast cells are normal (the DFS stops when it returns to its origin); ~25% open scores 0
+FRONTIER_WEIGHT = 4
+
+# 4-connectivity, the same neighbourhood areaScanner_dfs walks
+FOUR = ndimage.generate_binary_structure(2, 1)
+
+ScanResult = namedtuple('ScanResult', [
+    'city', 'region', 'area_id', 'step', 'cells', 'land_components', 'access_points', 'unreachable',
+    'inland_water', 'frontier', 'holes', 'gaps', 'score', 'passed',
+])
+
+
+def parse_area_scan(path):
+    """Return (region, {(x, y): letter}, [(x, y) access points]) from an area_scan TSV."""
+    region = None
+    points = {}
+    access_points = set()
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            fields = line.split()
+            if len(fields) < 2:
+                continue
+            if region is None:
+                match = REGION_FIELD_RE.search(line)
+                if match:
+                    region = match.group(1)
+            parts = fields[-1].replace('msg=', '').split(',')
+            if len(parts) < 3:
+                continue
+            try:
+                xy = (int(parts[0]), int(parts[1]))
+            except ValueError:
+                continue
+            if parts[2] == ACCESS_POINT:
+                access_points.add(xy)
+            elif parts[2] in LETTER_CODES:
+                points[xy] = parts[2]
+    return region, points, sorted(access_points)
+
+
+def rasterize(points):
+    """Place scan points on their grid; returns (grid, origin_x, origin_y, step) with one padding cell around."""
+    xy = np.array(list(points), dtype=np.int64)
+    codes = np.array([LETTER_CODES[v] for v in points.values()], dtype=np.int8)
+    x0, y0 = xy.min(axis=0)
+    step = reduce(gcd, np.unique(np.concatenate([xy[:, 0] - x0, xy[:, 1] - y0])).tolist(), 0) or 1
+
+    ix = (xy[:, 0] - x0) // step + 1
+    iy = (xy[:, 1] - y0) // step + 1
+    grid = np.zeros((ix.max() + 2, iy.max() + 2), dtype=np.int8)
+    grid[ix, iy] = codes
+    return grid, int(x0) - step, int(y0) - step, int(step)
+
+
+def touches_border(mask):
+    """Cells of `mask` in 4-connected components that reach the raster border."""
+    labels, _ = ndimage.label(mask, structure=FOUR)
+    border = np.unique(np.concatenate([labels[0], labels[-1], labels[:, 0], labels[:, -1]]))
+    return np.isin(labels, border[border > 0])
+
+
+def check_scan(points, access_points, rect=None):
+    """Label the raster and compute the quality metrics; returns a dict."""
+    grid, ox, oy, step = rasterize(points)
+    solid = (grid == LAND) | (grid == SOMETHING_THERE)
+
+    # open sea: everything ships can sail through that connects to the border of the padded raster
+    sea = touches_border(~solid)
+    # never-probed cells outside of the scan, as opposed to holes enclosed by scanned cells
+    outside = touches_border(grid == UNSCANNED)
+
+    _, land_components = ndimage.label(solid, structure=FOUR)
+    inland_water = int(((grid == WATER) & ~sea).sum())
+    holes = int(((grid == UNSCANNED) & ~outside).sum())
+
+    # scanned non-N cells next to never-probed cells outside: the coast was not closed off by N cells there.
+    # Holes are normal, the DFS halts once it is back at its origin.
+    explored = (grid != UNSCANNED) & (grid != NOT_ACCESSIBLE)
+    frontier = explored & ndimage.binary_dilation(outside, structure=FOUR)
+
+    unreachable = []
+    for x, y in access_points:
+        ix = int(round((x - ox) / step))
+        iy = int(round((y - oy) / step))
+        if 0 <= ix < grid.shape[0] and 0 <= iy < grid.shape[1] and not sea[ix, iy]:
+            unreachable.append((x, y))
+
+    gaps = {}
+    if rect is not None:
+        cells = np.argwhere(explored)
+        if len(cells):
+            min_x, min_y = cells.min(axis=0) * step + (ox, oy)
+            max_x, max_y = cells.max(axis=0) * step + (ox, oy)
+            r_min_x, r_min_y, r_max_x, r_max_y = rect
+            for side, gap, tolerance in (('west', min_x - r_min_x, P11_DELTA_X), ('east', r_max_x - max_x, P11_DELTA_X),
+                                         ('south', min_y - r_min_y, P11_DELTA_Y), ('north', r_max_y - max_y, P11_DELTA_Y)):
+                if gap > tolerance:
+                    gaps[side] = int(gap)
+
+    n_explored = max(int(explored.sum()), 1)
+    reachable = (len(access_points) - len(unreachable)) / len(access_points) if access_points else 0.0
+    completeness = max(0.0, 1 - FRONTIER_WEIGHT * int(frontier.sum()) / n_explored)
+    coverage = 1 - len(gaps) / 4
+    score = round(100 * (0.5 * reachable + 0.25 * completeness + 0.25 * coverage))
+
+    return {
+        'step': step,
+        'cells': int((grid != UNSCANNED).sum()),
+        'land_components': int(land_components),
+        'access_points': len(access_points),
+        'unreachable': unreachable,
+        'inland_water': inland_water,
+        'frontier': int(frontier.sum()),
+        'holes': holes,
+        'gaps': gaps,
+        'score': score,
+    }
+
+
+def match_area(points, rects):
+    """Area whose session rectangle contains most of the scanned land."""
+    if not rects:
+        return None
+    xy = np.array([p for p, v in points.items() if v in ('L', 'S')] or list(points), dtype=np.int64)
+    best, best_count = None, 0
+    for area_id, (min_x, min_y, max_x, max_y) in rects.items():
+        count = int(((xy[:, 0] >= min_x) & (xy[:, 0] <= max_x) & (xy[:, 1] >= min_y) & (xy[:, 1] <= max_y)).sum())
+        if count > best_count:
+            best, best_count = area_id, count
+    return best
+
+
+def load_session_rectangles(logs_dir, profile):
+    """region -> {area_id: rect} from the profile's map_scanner.Session(P11) caches."""
+    rects = {}
+    for path in Path(logs_dir).glob(f"TrRAt_Cache_{profile}__Func{FUNC_SESSION_SCAN}*.json"):
+        cf = parse_cache_file_name(path)
+        if cf is None or cf.func != FUNC_SESSION_SCAN or cf.region is None:
+            continue
+        with open(path, 'r', encoding='utf-8', errors='surrogateescape') as f:
+            rects[cf.region] = session_area_rectangles(json.load(f))
+    return rects
+
+
+def check_file(path, rects_by_region, min_score):
+    region, points, access_points = parse_area_scan(path)
+    city = AREA_SCAN_FILE_RE.match(path.name).group('city')
+    if not points:
+        return ScanResult(city, region, None, None, 0, 0, len(access_points), access_points, 0, 0, 0, {}, 0, False)
+
+    area_id = match_area(points, rects_by_region.get(region, {}))
+    rect = rects_by_region.get(region, {}).get(area_id)
+    m = check_scan(points, access_points, rect)
+    passed = m['score'] >= min_score and m['access_points'] > len(m['unreachable'])
+    return ScanResult(city=city, region=region, area_id=area_id, passed=passed, **m)
+
+
+def format_result(r):
+    status = "PASS" if r.passed else "FAIL"
+    lines = [f"  {status} {r.score:3d} {r.region or '??'} {r.city}"
+             f"{f' (area {r.area_id})' if r.area_id is not None else ''}: step={r.step} cells={r.cells} "
+             f"land components={r.land_components} access points={r.access_points}"]
+    if r.unreachable:
+        sample = ", ".join(f"{x},{y}" for x, y in r.unreachable[:3])
+        lines.append(f"       {len(r.unreachable)} unreachable water access points (e.g. {sample})")
+    if r.frontier:
+        lines.append(f"       {r.frontier} cells next to never-probed cells (scan did not close the coast)")
+    if r.holes:
+        lines.append(f"       {r.holes} unscanned cells enclosed by the scan (not scored)")
+    if r.inland_water:
+        lines.append(f"       {r.inland_water} water cells not connected to open sea")
+    if r.gaps:
+        lines.append("       not reaching the area rectangle: "
+                     + ", ".join(f"{side} by {gap}" for side, gap in r.gaps.items()))
+    return lines
+
+
+def main():
+    script_dir = Path(__file__).parent
+    repo_root = script_dir.parent
+
+    parser = argparse.ArgumentParser(description='Check area_scan_*.tsv files for broken island scans')
+    parser.add_argument('files', type=Path, nargs='*', help="area_scan TSV files (default: all in --logs-dir)")
+    parser.add_argument('--logs-dir', type=Path, default=repo_root / 'anno-1800' / 'trade-route-automation',
+                        help="Directory with TrRAt_<profile>_area_scan_*.tsv and TrRAt_Cache_* files")
+    parser.add_argument('--profile', help="Only check this profile")
+    parser.add_argument('--regions', nargs='+', help="Only check these regions (e.g. 'OW NW')")
+    parser.add_argument('--min-score', type=int, default=80, help="Score (0-100) needed to pass; default 80")
+    parser.add_argument('--verbose', '-v', action='store_true', help="Also list details for passing scans")
+    args = parser.parse_args()
+
+    files = args.files or sorted(args.logs_dir.glob('TrRAt_*_area_scan_*.tsv'))
+    files = [f for f in files if AREA_SCAN_FILE_RE.match(f.name)]
+    if args.profile:
+        files = [f for f in files if AREA_SCAN_FILE_RE.match(f.name).group('profile') == args.profile]
+    if not files:
+        print(f"Error: no area scan files found in {args.logs_dir}", file=sys.stderr)
+        sys.exit(1)
+
+    started = time.perf_counter()
+    rects = {}
+    results = {}
+    for path in files:
+        profile = AREA_SCAN_FILE_RE.match(path.name).group('profile')
+        if profile not in rects:
+            rects[profile] = load_session_rectangles(path.parent, profile)
+        result = check_file(path, rects[profile], args.min_score)
+        if args.regions and result.region not in args.regions:
+            continue
+        results.setdefault(profile, []).append(result)
+    elapsed = time.perf_counter() - started
+
+    failed = 0
+    for profile, profile_results in results.items():
+        if not rects[profile]:
+            print(f"[{profile}] no session scan cache found, skipping rectangle coverage check")
+        print(f"[{profile}]")
+        for r in sorted(profile_results, key=lambda r: (r.region or '', r.passed, r.score)):
+            lines = format_result(r)
+            print("\n".join(lines if (args.verbose or not r.passed) else lines[:1]))
+            failed += not r.passed
+
+    total = sum(len(r) for r in results.values())
+    print(f"\n{total - failed}/{total} scans passed ({elapsed * 1000:.0f} ms)")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
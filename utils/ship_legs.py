@@ -0,0 +1,337 @@
+#!/usr/bin/env python3
+"""
+Per-ship trade legs: where each automation ship went, how far it sailed and how long it sat in harbours.
+
+Ship names carry the current destination as `name-x-y-areaID` in base62 (Ship_Name_StoreCmdInfo in
+mod_trade_executor.lua). Legs come from trade-executor-history.json, destination coordinates from the
+decoded `ship_name`. When base logs are given, the executor lines tagged `ship="<oid> (<name>)"` split each
+trade into sailing to the source, loading, sailing to the destination and unloading.
+
+Legs are stored as one .npz: columns sorted by ship and trade start, plus `ship_offsets` so that ship i
+owns rows ship_offsets[i]:ship_offsets[i + 1].
+"""
+
+import argparse
+import re
+import sys
+from pathlib import Path
+
+import numpy as np
+
+from analyze_trades import format_box_table, load_trades, parse_time_bound
+from trade_query import to_epoch_seconds
+
+ALPHABET = "0123456789abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ"
+SEPARATOR = "-"
+_ALPHABET_INDEX = {c: i for i, c in enumerate(ALPHABET)}
+
+UNKNOWN = -1
+
+SHIP_FIELD_RE = re.compile(r'\bship="?(\d+) \(')
+TIMESTAMP_RE = re.compile(r'^(\d{4}-\d{2}-\d{2}T\d{2}:\d{2}:\d{2}Z?)\s')
+
+# executor steps in mod_trade_executor.lua _ExecuteTradeOrderWithShip, in order
+MOVE_SRC, ARRIVED_SRC, LOADED, ARRIVED_DST, COMPLETED = range(5)
+EVENT_RES = [
+    (MOVE_SRC, re.compile(r'Moving ship \d+ to source area \d+ \(x=(\d+), y=(\d+)\)')),
+    (ARRIVED_SRC, re.compile(r'Ship \d+ arrived at source area')),
+    (LOADED, re.compile(r'Loaded \d+ total units; .* moving to dst area \(x=(\d+) y=(\d+)\)')),
+    (ARRIVED_DST, re.compile(r'Ship arrived at destination area')),
+    (COMPLETED, re.compile(r'Trade order completed:')),
+]
+
+COLUMNS = ['oid', 'start', 'end', 'src_area', 'dst_area', 'good', 'amount', 'src_x', 'src_y', 'dst_x', 'dst_y',
+           'distance', 'reposition', 'idle_before', 'sail_to_src', 'loading', 'sail_to_dst', 'unloading']
+
+
+def number_to_base62(num):
+    """Port of TradeExecutor.numberToBase62."""
+    if num == 0:
+        return "0"
+    result = ""
+    while num > 0:
+        num, remainder = divmod(num, len(ALPHABET))
+        result = ALPHABET[remainder] + result
+    return result
+
+
+def base62_to_number(text):
+    """Port of TradeExecutor.base62ToNumber."""
+    num = 0
+    for c in text:
+        num = num * len(ALPHABET) + _ALPHABET_INDEX[c]
+    return num
+
+
+def decode_ship_name(name):
+    """Port of TradeExecutor.Ship_Name_FetchCmdInfo: (name, x, y, area_id), coordinates None if not packed."""
+    if any(c not in _ALPHABET_INDEX and c != SEPARATOR for c in name):
+        return name, None, None, None
+    parts = [p for p in name.split(SEPARATOR) if p]
+    if len(parts) < 4:
+        return name, None, None, None
+    x, y, area_id = (base62_to_number(p) for p in parts[1:4])
+    if x <= 0 or y <= 0 or area_id <= 0:
+        return name, None, None, None
+    return parts[0], x, y, area_id
+
+
+def decode_ship_names(names):
+    """Bulk decode; returns (x, y, area_id) int arrays with UNKNOWN where nothing is packed."""
+    decoded = {name: decode_ship_name(name) for name in set(names)}
+    out = np.full((len(names), 3), UNKNOWN, dtype=np.int64)
+    for i, name in enumerate(names):
+        _, x, y, area_id = decoded[name]
+        if x is not None:
+            out[i] = (x, y, area_id)
+    return out[:, 0], out[:, 1], out[:, 2]
+
+
+def parse_executor_events(log_files):
+    """Return (oid, time, kind, x, y) arrays for the executor steps found in the given logs."""
+    oids, times, kinds, xs, ys = [], [], [], [], []
+    for log_file in log_files:
+        with open(log_file, 'r', encoding='utf-8', errors='replace') as f:
+            for line in f:
+                if 'ship=' not in line:
+                    continue
+                ship = SHIP_FIELD_RE.search(line)
+                ts = TIMESTAMP_RE.match(line)
+                if not ship or not ts:
+                    continue
+                for kind, regex in EVENT_RES:
+                    match = regex.search(line)
+                    if match:
+                        coords = match.groups()
+                        oids.append(int(ship.group(1)))
+                        times.append(ts.group(1))
+                        kinds.append(kind)
+                        xs.append(int(coords[0]) if coords else UNKNOWN)
+                        ys.append(int(coords[1]) if coords else UNKNOWN)
+                        break
+    return (np.array(oids, dtype=np.int64), to_epoch_seconds(times), np.array(kinds, dtype=np.int64),
+            np.array(xs, dtype=np.int64), np.array(ys, dtype=np.int64))
+
+
+class ShipLegs:
+    """Leg columns sorted by (ship, start); `ship_offsets` delimits each ship's rows."""
+
+    def __init__(self, ships, ship_offsets, columns):
+        self.ships = ships
+        self.ship_offsets = ship_offsets
+        self.columns = columns
+
+    def __getattr__(self, name):
+        try:
+            return self.__dict__['columns'][name]
+        except KeyError:
+            raise AttributeError(name) from None
+
+    def __len__(self):
+        return len(self.columns['start'])
+
+    def ship(self, oid):
+        """Columns of a single ship."""
+        i = int(np.searchsorted(self.ships, oid))
+        if i >= len(self.ships) or self.ships[i] != oid:
+            raise KeyError(oid)
+        lo, hi = self.ship_offsets[i], self.ship_offsets[i + 1]
+        return {k: v[lo:hi] for k, v in self.columns.items()}
+
+    @classmethod
+    def from_records(cls, trades, events=None):
+        n = len(trades)
+        oid = np.fromiter((t['ship_oid'] for t in trades), dtype=np.int64, count=n)
+        start = to_epoch_seconds([t['_start'] for t in trades])
+        end = to_epoch_seconds([t['_end'] for t in trades])
+        order = np.lexsort((start, oid))
+        oid, start, end = oid[order], start[order], end[order]
+        trades = [trades[i] for i in order]
+
+        dst_x, dst_y, _ = decode_ship_names([t.get('ship_name', '') for t in trades])
+        c = {
+            'oid': oid,
+            'start': start,
+            'end': end,
+            'src_area': np.fromiter((t['area_src'] for t in trades), dtype=np.int64, count=n),
+            'dst_area': np.fromiter((t['area_dst'] for t in trades), dtype=np.int64, count=n),
+            'good': np.fromiter((t['good_id'] for t in trades), dtype=np.int64, count=n),
+            'amount': np.fromiter((t['good_amount'] for t in trades), dtype=np.int32, count=n),
+            'src_x': np.full(n, UNKNOWN, dtype=np.int32),
+            'src_y': np.full(n, UNKNOWN, dtype=np.int32),
+            'dst_x': dst_x.astype(np.int32),
+            'dst_y': dst_y.astype(np.int32),
+        }
+
+        # executor step timestamps per leg; UNKNOWN where the logs do not cover it
+        steps = np.full((n, len(EVENT_RES)), UNKNOWN, dtype=np.int64)
+        if events is not None and len(events[0]) and n:
+            e_oid, e_time, e_kind, e_x, e_y = events
+            # (oid, time) packed into one sortable key: an event belongs to the last leg of its ship started before it
+            t0 = min(start.min(), e_time.min())
+            span = int(max(end.max(), e_time.max()) - t0) + 1
+            leg = np.searchsorted(oid * span + (start - t0), e_oid * span + (e_time - t0), side='right') - 1
+            ok = leg >= 0
+            ok[ok] &= (oid[leg[ok]] == e_oid[ok]) & (e_time[ok] <= end[leg[ok]])
+            leg, e_time, e_kind, e_x, e_y = leg[ok], e_time[ok], e_kind[ok], e_x[ok], e_y[ok]
+
+            # first occurrence of each (leg, step)
+            first = np.lexsort((e_time, e_kind, leg))
+            keep = np.ones(len(first), dtype=bool)
+            keep[1:] = (leg[first][1:] != leg[first][:-1]) | (e_kind[first][1:] != e_kind[first][:-1])
+            first = first[keep]
+            steps[leg[first], e_kind[first]] = e_time[first]
+
+            moved = first[e_kind[first] == MOVE_SRC]
+            c['src_x'][leg[moved]] = e_x[moved]
+            c['src_y'][leg[moved]] = e_y[moved]
+            loaded = first[(e_kind[first] == LOADED) & (c['dst_x'][leg[first]] == UNKNOWN)]
+            c['dst_x'][leg[loaded]] = e_x[loaded]
+            c['dst_y'][leg[loaded]] = e_y[loaded]
+
+        def span_between(a, b):
+            known = (a != UNKNOWN) & (b != UNKNOWN)
+            return np.where(known, b - a, UNKNOWN).astype(np.int32)
+
+        arrived_src, loaded_at, arrived_dst = steps[:, ARRIVED_SRC], steps[:, LOADED], steps[:, ARRIVED_DST]
+        c['sail_to_src'] = span_between(start, arrived_src)
+        c['loading'] = span_between(arrived_src, loaded_at)
+        c['sail_to_dst'] = span_between(loaded_at, arrived_dst)
+        c['unloading'] = span_between(arrived_dst, end)
+
+        ships, first_leg = np.unique(oid, return_index=True)
+        ship_offsets = np.append(first_leg, n).astype(np.int64)
+        new_ship = np.zeros(n, dtype=bool)
+        new_ship[first_leg] = True
+
+        # the ship waits at the previous destination until the next trade starts
+        prev = np.arange(n) - 1
+        c['idle_before'] = np.where(new_ship, UNKNOWN, start - end[prev]).astype(np.int32)
+
+        src_known = c['src_x'] != UNKNOWN
+        dst_known = c['dst_x'] != UNKNOWN
+        c['distance'] = np.where(src_known & dst_known,
+                                 np.hypot(c['dst_x'] - c['src_x'], c['dst_y'] - c['src_y']), np.nan).astype(np.float32)
+        prev_known = np.roll(dst_known, 1) & ~new_ship & src_known
+        c['reposition'] = np.where(prev_known,
+                                   np.hypot(c['src_x'] - np.roll(c['dst_x'], 1), c['src_y'] - np.roll(c['dst_y'], 1)),
+                                   np.nan).astype(np.float32)
+        return cls(ships, ship_offsets, c)
+
+    def save(self, path):
+        np.savez_compressed(path, ships=self.ships, ship_offsets=self.ship_offsets, **self.columns)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            return cls(data['ships'], data['ship_offsets'], {k: data[k] for k in COLUMNS})
+
+
+def seconds_known(values):
+    return float(values[values != UNKNOWN].sum())
+
+
+def format_summary(legs, top=15):
+    """Fleet sailing vs harbour time and a per-ship table."""
+    lines = []
+    trade_s = float((legs.end - legs.start).sum())
+    sail_s = seconds_known(legs.sail_to_src) + seconds_known(legs.sail_to_dst)
+    harbour_s = seconds_known(legs.loading) + seconds_known(legs.unloading)
+    idle_s = seconds_known(legs.idle_before)
+    split = (legs.sail_to_src != UNKNOWN) & (legs.sail_to_dst != UNKNOWN)
+
+    def hours(s):
+        return f"{s / 3600:.1f}h"
+
+    lines.append(f"Ships: {len(legs.ships)}, legs: {len(legs)} ({int(split.sum())} with executor timings)")
+    lines.append(f"In trades: {hours(trade_s)}; sailing {hours(sail_s)}, loading/unloading {hours(harbour_s)}")
+    lines.append(f"Idle between trades: {hours(idle_s)}"
+                 + (f" ({idle_s / (idle_s + trade_s):.1%} of ship time)" if idle_s + trade_s else ""))
+    known_distance = ~np.isnan(legs.distance) & (legs.sail_to_dst > 0)
+    if known_distance.any():
+        speed = legs.distance[known_distance].sum() / legs.sail_to_dst[known_distance].sum()
+        lines.append(f"Average speed source -> destination: {speed * 60:.1f} units/min")
+
+    rows = []
+    for i, oid in enumerate(legs.ships):
+        lo, hi = legs.ship_offsets[i], legs.ship_offsets[i + 1]
+        ship_trade = float((legs.end[lo:hi] - legs.start[lo:hi]).sum())
+        ship_idle = seconds_known(legs.idle_before[lo:hi])
+        ship_sail = seconds_known(legs.sail_to_src[lo:hi]) + seconds_known(legs.sail_to_dst[lo:hi])
+        ship_harbour = seconds_known(legs.loading[lo:hi]) + seconds_known(legs.unloading[lo:hi])
+        distance = float(np.nansum(legs.distance[lo:hi]) + np.nansum(legs.reposition[lo:hi]))
+        total = ship_trade + ship_idle
+        rows.append((ship_idle / total if total else 0.0, [
+            str(oid), str(hi - lo), hours(ship_trade), hours(ship_sail), hours(ship_harbour), hours(ship_idle),
+            f"{ship_idle / total:.0%}" if total else "-", f"{distance:.0f}",
+        ]))
+    rows.sort(key=lambda r: -r[0])
+
+    lines.append("")
+    lines.append("Ships by idle share:")
+    lines.extend(format_box_table(["Ship", "Legs", "Trading", "Sailing", "Harbour", "Idle", "Idle %", "Distance"],
+                                  [r for _, r in rows[:top]]))
+    return lines
+
+
+def main():
+    script_dir = Path(__file__).parent
+    repo_root = script_dir.parent
+
+    parser = argparse.ArgumentParser(description='Per-ship trade legs, sailing and harbour times')
+    parser.add_argument('history', type=Path, nargs='?',
+                        default=repo_root / 'anno-1800' / 'trade-route-automation' / 'trade-executor-history.json',
+                        help='trade-executor-history.json')
+    parser.add_argument('--log', type=Path, action='append', default=[],
+                        help="base.log (or iteration logs) with executor lines; repeatable")
+    parser.add_argument('--from', dest='time_from', help="Window start: 'now', relative ('2h') or absolute")
+    parser.add_argument('--to', dest='time_to', help="Window end (same formats as --from)")
+    parser.add_argument('--output', '-o', type=Path, help="Write the per-ship leg store (.npz)")
+    parser.add_argument('--input', '-i', type=Path, help="Read a previously written leg store instead of history")
+    parser.add_argument('--ship', type=int, action='append', help="Print legs of this ship oid (repeatable)")
+    parser.add_argument('--top', type=int, default=15, help="Ships to show in the table")
+    args = parser.parse_args()
+
+    if args.input:
+        legs = ShipLegs.load(args.input)
+    else:
+        try:
+            time_from = parse_time_bound(args.time_from) if args.time_from else None
+            time_to = parse_time_bound(args.time_to) if args.time_to else None
+        except ValueError as e:
+            print(f"Error: {e}", file=sys.stderr)
+            sys.exit(1)
+        if not args.history.exists():
+            print(f"Error: {args.history} does not exist", file=sys.stderr)
+            sys.exit(1)
+        trades, note = load_trades(args.history, time_from=time_from, time_to=time_to)
+        if note:
+            print(note)
+        events = parse_executor_events([p for p in args.log if p.exists()]) if args.log else None
+        legs = ShipLegs.from_records(trades, events)
+
+    if args.output:
+        legs.save(args.output)
+        print(f"Leg store written to: {args.output}")
+
+    for line in format_summary(legs, args.top):
+        print(line)
+
+    for oid in args.ship or []:
+        try:
+            ship = legs.ship(oid)
+        except KeyError:
+            print(f"\nShip {oid}: no legs")
+            continue
+        print(f"\nShip {oid}:")
+        rows = [[str(ship['src_area'][i]), str(ship['dst_area'][i]), f"{ship['src_x'][i]},{ship['src_y'][i]}",
+                 f"{ship['dst_x'][i]},{ship['dst_y'][i]}", f"{ship['distance'][i]:.0f}",
+                 *(str(ship[k][i]) for k in ('idle_before', 'sail_to_src', 'loading', 'sail_to_dst', 'unloading'))]
+                for i in range(len(ship['start']))]
+        for line in format_box_table(["Src", "Dst", "Src xy", "Dst xy", "Dist", "Idle s", "To src s",
+                                      "Load s", "To dst s", "Unload s"], rows):
+            print(line)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,276 @@
+#!/usr/bin/env python3
+"""
+Ping-pong and circular trade detection over trade-executor-history.json.
+
+A ping-pong is a trade A->B of a good followed by B->A of the same good within `--window`; the reversal
+leg is counted as wasted. Longer cycles (A->B->C->A) are found per good and window with strongly
+connected components over a sparse area graph; the volume circulating around a cycle moves nothing net,
+so the ship-hours spent on it are counted as wasted too. The planner is supposed to prevent both with
+areaTradeDirection_Get/_Last/_Set in mod_trade_planner_hl.lua.
+"""
+
+import argparse
+import sys
+from collections import defaultdict
+from pathlib import Path
+
+import numpy as np
+from scipy import sparse
+from scipy.sparse.csgraph import connected_components
+
+from analyze_trades import format_box_table, load_goods_names, load_trades, parse_duration, parse_time_bound
+from trade_query import intern, to_epoch_seconds
+
+
+class TradeLegs:
+    """Trade records as columns; goods and areas interned by ID."""
+
+    def __init__(self, trades, goods_names):
+        n = len(trades)
+        self.good, good_ids = intern([t['good_id'] for t in trades])
+        area, self.area_ids = intern([t['area_src'] for t in trades] + [t['area_dst'] for t in trades])
+        self.src, self.dst = area[:n], area[n:]
+        self.start = to_epoch_seconds([t['_start'] for t in trades])
+        self.end = to_epoch_seconds([t['_end'] for t in trades])
+        self.amount = np.fromiter((t['good_amount'] for t in trades), dtype=np.float64, count=n)
+        self.hours = np.maximum(self.end - self.start, 0) / 3600
+
+        names = {t['area_src']: t['area_src_name'] for t in trades}
+        names.update({t['area_dst']: t['area_dst_name'] for t in trades})
+        self.area_names = [names[a] for a in self.area_ids]
+        good_names = {t['good_id']: t['good_name'] for t in trades if 'good_name' in t}
+        self.good_names = [good_names.get(g, goods_names.get(str(g), f"Unknown({g})")) for g in good_ids]
+
+    def __len__(self):
+        return len(self.amount)
+
+
+def find_ping_pongs(legs, window):
+    """
+    Match every trade A->B with the first B->A of the same good that starts within `window` seconds after it
+    (or in the same second, if it comes later in the history).
+    Returns (forward, reversal) index arrays; each reversal leg appears once.
+    """
+    n = len(legs)
+    if n == 0:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+
+    c = len(legs.area_ids)
+    key = (legs.good * c + legs.src) * c + legs.dst
+    reverse_key = (legs.good * c + legs.dst) * c + legs.src
+
+    # (key, start rank) packed into one sortable integer so a single searchsorted finds the next reverse leg.
+    # Legs starting in the same second (both directions spawned in one planner iteration) are ordered by
+    # record index, so such a pair is matched once, from the earlier record.
+    rank = np.empty(n, dtype=np.int64)
+    rank[np.argsort(legs.start, kind='stable')] = np.arange(n)
+    packed = key * n + rank
+    order = np.argsort(packed)
+    packed_sorted = packed[order]
+
+    pos = np.searchsorted(packed_sorted, reverse_key * n + rank + 1, side='left')
+    found = pos < n
+    pos = np.minimum(pos, n - 1)
+    candidate = order[pos]
+    found &= key[candidate] == reverse_key
+    found &= legs.start[candidate] - legs.start <= window
+
+    forward = np.flatnonzero(found)
+    reversal = candidate[found]
+    reversal, first = np.unique(reversal, return_index=True)
+    return forward[first], reversal
+
+
+def simple_cycles(edges, nodes, min_length, max_length):
+    """Yield simple cycles (as node lists) of the given lengths within one strongly connected component."""
+    nodes = sorted(nodes)
+    for i, root in enumerate(nodes):
+        allowed = set(nodes[i:])
+        stack = [(root, [root])]
+        while stack:
+            node, path = stack.pop()
+            for nxt in edges.get(node, ()):
+                if nxt == root and len(path) >= min_length:
+                    yield path
+                elif nxt in allowed and nxt not in path and len(path) < max_length:
+                    stack.append((nxt, path + [nxt]))
+
+
+def find_cycles(legs, window, max_length=4, exclude=None):
+    """
+    Cancel circulating flow around cycles of length 3..max_length per (window bucket, good).
+    Legs in `exclude` (ping-pong reversals, already counted as wasted) are left out of the graph.
+    Returns a list of (bucket, good, [areas], volume, ship_hours).
+    """
+    n = len(legs)
+    if n == 0:
+        return []
+    keep = np.ones(n, dtype=bool)
+    if exclude is not None:
+        keep[exclude] = False
+
+    c = len(legs.area_ids)
+    g = len(legs.good_names)
+    bucket = (legs.start - legs.start.min()) // window
+    group = bucket * g + legs.good
+    n_nodes = int(group.max() + 1) * c
+
+    # one block-diagonal graph: node = (bucket, good, area); a single SCC pass covers every bucket and good
+    rows, cols = (group * c + legs.src)[keep], (group * c + legs.dst)[keep]
+    volume = sparse.csr_matrix((legs.amount[keep], (rows, cols)), shape=(n_nodes, n_nodes))
+    hours = sparse.csr_matrix((legs.hours[keep], (rows, cols)), shape=(n_nodes, n_nodes))
+    _, labels = connected_components(volume, directed=True, connection='strong')
+    sizes = np.bincount(labels)
+
+    candidates = sizes[labels] >= 3
+    members = defaultdict(list)
+    for node in np.flatnonzero(candidates):
+        members[labels[node]].append(int(node))
+
+    cycles = []
+    for component in members.values():
+        sub = volume[component][:, component].tocoo()
+        sub_hours = hours[component][:, component].tocsr()
+        weights = {(component[i], component[j]): w for i, j, w in zip(sub.row, sub.col, sub.data)}
+        totals = dict(weights)
+        edges = defaultdict(list)
+        for a, b in weights:
+            edges[a].append(b)
+
+        local = {node: i for i, node in enumerate(component)}
+        for cycle in simple_cycles(edges, component, 3, max_length):
+            pairs = list(zip(cycle, cycle[1:] + cycle[:1]))
+            flow = min(weights[p] for p in pairs)
+            if flow <= 0:
+                continue
+            wasted_hours = 0.0
+            for p in pairs:
+                weights[p] -= flow
+                wasted_hours += flow / totals[p] * sub_hours[local[p[0]], local[p[1]]]
+            grp = cycle[0] // c
+            cycles.append((grp // g, grp % g, [node % c for node in cycle], flow, wasted_hours))
+    return cycles
+
+
+def churn_report(legs, window, max_cycle=4, top=10):
+    """Render summary and rankings as lines."""
+    lines = []
+    total_hours = legs.hours.sum()
+    forward, reversal = find_ping_pongs(legs, window)
+    cycles = find_cycles(legs, window, max_cycle, exclude=reversal)
+
+    pp_volume = np.minimum(legs.amount[forward], legs.amount[reversal])
+    pp_hours = legs.hours[reversal]
+    cycle_hours = sum(cy[4] for cy in cycles)
+
+    def share(h):
+        return f"{h / total_hours:.1%}" if total_hours else "-"
+
+    lines.append(f"Trades: {len(legs)}, ship-hours: {total_hours:.1f}")
+    lines.append(f"Ping-pong reversals: {len(reversal)}, wasted ship-hours: {pp_hours.sum():.1f} ({share(pp_hours.sum())})")
+    lines.append(f"Cycles (3-{max_cycle} areas): {len(cycles)}, wasted ship-hours: {cycle_hours:.1f} ({share(cycle_hours)})")
+    if len(reversal) == 0 and not cycles:
+        return lines
+
+    n_goods, n_areas = len(legs.good_names), len(legs.area_ids)
+    good_hours = np.bincount(legs.good[reversal], weights=pp_hours, minlength=n_goods)
+    good_volume = np.bincount(legs.good[reversal], weights=pp_volume, minlength=n_goods)
+    good_count = np.bincount(legs.good[reversal], minlength=n_goods)
+    # each reversal is split between its two endpoints, like cycles are split between their areas
+    area_hours = (np.bincount(legs.src[reversal], weights=pp_hours / 2, minlength=n_areas)
+                  + np.bincount(legs.dst[reversal], weights=pp_hours / 2, minlength=n_areas))
+    area_volume = (np.bincount(legs.src[reversal], weights=pp_volume / 2, minlength=n_areas)
+                   + np.bincount(legs.dst[reversal], weights=pp_volume / 2, minlength=n_areas))
+    for _, good, areas, volume, hours in cycles:
+        good_hours[good] += hours
+        good_volume[good] += volume
+        good_count[good] += 1
+        for area in areas:
+            area_hours[area] += hours / len(areas)
+            area_volume[area] += volume / len(areas)
+
+    lines.append("")
+    lines.append("Goods by wasted ship-hours:")
+    order = [i for i in np.argsort(-good_hours, kind='stable') if good_hours[i] > 0][:top]
+    rows = [[legs.good_names[i], str(int(good_count[i])), str(int(good_volume[i])), f"{good_hours[i]:.1f}"]
+            for i in order]
+    lines.extend(format_box_table(["Good", "Trips", "Volume", "Ship-hours"], rows))
+
+    lines.append("")
+    lines.append("Areas by churn:")
+    order = [i for i in np.argsort(-area_hours, kind='stable') if area_hours[i] > 0][:top]
+    rows = [[legs.area_names[i], str(int(area_volume[i])), f"{area_hours[i]:.1f}"] for i in order]
+    lines.extend(format_box_table(["Area", "Volume", "Ship-hours"], rows))
+
+    if len(reversal):
+        c = len(legs.area_ids)
+        a, b = np.minimum(legs.src[reversal], legs.dst[reversal]), np.maximum(legs.src[reversal], legs.dst[reversal])
+        pair = (legs.good[reversal] * c + a) * c + b
+        pairs, inverse = np.unique(pair, return_inverse=True)
+        pair_hours = np.bincount(inverse, weights=pp_hours)
+        pair_count = np.bincount(inverse)
+        lines.append("")
+        lines.append("Top ping-pong pairs:")
+        rows = []
+        for i in np.argsort(-pair_hours, kind='stable')[:top]:
+            good, rest = divmod(int(pairs[i]), c * c)
+            x, y = divmod(rest, c)
+            rows.append([legs.good_names[good], f"{legs.area_names[x]} <-> {legs.area_names[y]}",
+                         str(int(pair_count[i])), f"{pair_hours[i]:.1f}"])
+        lines.extend(format_box_table(["Good", "Areas", "Reversals", "Ship-hours"], rows))
+
+    if cycles:
+        lines.append("")
+        lines.append("Top cycles:")
+        rows = []
+        for _, good, areas, volume, hours in sorted(cycles, key=lambda cy: -cy[4])[:top]:
+            path = " -> ".join(legs.area_names[a] for a in areas + areas[:1])
+            rows.append([legs.good_names[good], path, str(int(volume)), f"{hours:.1f}"])
+        lines.extend(format_box_table(["Good", "Cycle", "Volume", "Ship-hours"], rows))
+    return lines
+
+
+def main():
+    script_dir = Path(__file__).parent
+    repo_root = script_dir.parent
+
+    parser = argparse.ArgumentParser(description='Detect ping-pong and circular trades in trade-executor-history.json')
+    parser.add_argument('history', type=Path, nargs='?',
+                        default=repo_root / 'anno-1800' / 'trade-route-automation' / 'trade-executor-history.json',
+                        help='trade-executor-history.json')
+    parser.add_argument('--window', default='1h',
+                        help="Max time between a trade and its reversal / cycle bucket size; default 1h")
+    parser.add_argument('--from', dest='time_from', help="Only trades from: 'now', relative ('2h') or absolute")
+    parser.add_argument('--to', dest='time_to', help="Only trades until (same formats as --from)")
+    parser.add_argument('--max-cycle', type=int, default=4, help="Longest cycle to look for (areas); default 4")
+    parser.add_argument('--top', type=int, default=10, help="Rows per ranking")
+    parser.add_argument('--texts', type=Path, default=repo_root / 'anno-1800' / 'texts.json',
+                        help="texts.json with good names")
+    args = parser.parse_args()
+
+    try:
+        window = int(parse_duration(args.window).total_seconds())
+        time_from = parse_time_bound(args.time_from) if args.time_from else None
+        time_to = parse_time_bound(args.time_to) if args.time_to else None
+    except ValueError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(1)
+    if window <= 0:
+        print("Error: --window must be positive", file=sys.stderr)
+        sys.exit(1)
+
+    if not args.history.exists():
+        print(f"Error: {args.history} does not exist", file=sys.stderr)
+        sys.exit(1)
+
+    goods_names = load_goods_names(args.texts) if args.texts.exists() else {}
+    trades, note = load_trades(args.history, time_from=time_from, time_to=time_to)
+    if note:
+        print(note)
+
+    for line in churn_report(TradeLegs(trades, goods_names), window, args.max_cycle, args.top):
+        print(line)
+
+
+if __name__ == '__main__':
+    main()
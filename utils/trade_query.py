@@ -0,0 +1,228 @@
+#!/usr/bin/env python3
+"""
+Time-bucketed queries over trade-executor-history.json.
+Computes per-bucket, per-good and per-city sent/received volumes in a single numpy pass.
+"""
+
+import argparse
+import sys
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+
+from analyze_trades import (format_box_table, format_trade_cell, load_goods_names, load_trades,
+                            parse_duration, parse_time_bound)
+
+
+def local_utc_offset_seconds():
+    """UTC offset applied by `parse_timestamp` to 'Z' (= local time) timestamps."""
+    return int(datetime.now().astimezone().utcoffset().total_seconds())
+
+
+def to_epoch_seconds(timestamps):
+    """Vectorized `parse_timestamp(...).timestamp()` for log timestamps ('Z' means local time)."""
+    naive = np.array([t[:-1] if t.endswith('Z') else t for t in timestamps], dtype='datetime64[s]')
+    return naive.astype(np.int64) - local_utc_offset_seconds()
+
+
+def intern(values):
+    """Map values to dense integer IDs; returns (ids, labels)."""
+    table = {}
+    ids = np.fromiter((table.setdefault(v, len(table)) for v in values), dtype=np.int64, count=len(values))
+    return ids, list(table)
+
+
+class TradeHistory:
+    """Columnar view of trade records: one numpy array per field, goods and cities interned."""
+
+    def __init__(self, start, end, good, src, dst, amount, goods, cities):
+        self.start = start
+        self.end = end
+        self.good = good
+        self.src = src
+        self.dst = dst
+        self.amount = amount
+        self.goods = goods
+        self.cities = cities
+
+    @classmethod
+    def from_records(cls, trades, goods_names):
+        good_labels = [t.get('good_name', goods_names.get(str(t['good_id']), f"Unknown({t['good_id']})"))
+                       for t in trades]
+        good, goods = intern(good_labels)
+        city, cities = intern([t['area_src_name'] for t in trades] + [t['area_dst_name'] for t in trades])
+        n = len(trades)
+        return cls(
+            start=to_epoch_seconds([t['_start'] for t in trades]),
+            end=to_epoch_seconds([t['_end'] for t in trades]),
+            good=good,
+            src=city[:n],
+            dst=city[n:],
+            amount=np.fromiter((t['good_amount'] for t in trades), dtype=np.float64, count=n),
+            goods=goods,
+            cities=cities,
+        )
+
+    def __len__(self):
+        return len(self.amount)
+
+    def bucketed(self, bucket, time_from=None, time_to=None):
+        """
+        Histogram sent (by trade start, source city) and received (by trade end, destination city)
+        volumes into `bucket`-sized windows of [time_from, time_to).
+        """
+        b = int(bucket.total_seconds())
+        if b <= 0:
+            raise ValueError("bucket must be positive")
+
+        if time_from is not None:
+            t0 = int(time_from.timestamp())
+        else:
+            t0 = int(self.start.min()) if len(self) else 0
+        if time_to is not None:
+            t1 = int(time_to.timestamp())
+        else:
+            t1 = int(max(self.start.max(), self.end.max())) + 1 if len(self) else t0 + 1
+
+        # align buckets to local midnight / hours, as they are labelled in local time
+        offset = local_utc_offset_seconds()
+        origin = (t0 + offset) // b * b - offset
+        n_buckets = max(1, -(-(t1 - origin) // b))
+        n_goods, n_cities = len(self.goods), len(self.cities)
+        size = n_buckets * n_goods * n_cities
+
+        def histogram(ts, city):
+            mask = (ts >= t0) & (ts < t1)
+            idx = ((ts[mask] - origin) // b * n_goods + self.good[mask]) * n_cities + city[mask]
+            counts = np.bincount(idx, weights=self.amount[mask], minlength=size)
+            return counts.reshape(n_buckets, n_goods, n_cities)
+
+        return BucketedVolumes(
+            edges=origin + b * np.arange(n_buckets, dtype=np.int64),
+            bucket_seconds=b,
+            goods=self.goods,
+            cities=self.cities,
+            sent=histogram(self.start, self.src),
+            received=histogram(self.end, self.dst),
+        )
+
+
+class BucketedVolumes:
+    """Volumes shaped (bucket, good, city) for both directions."""
+
+    def __init__(self, edges, bucket_seconds, goods, cities, sent, received):
+        self.edges = edges
+        self.bucket_seconds = bucket_seconds
+        self.goods = goods
+        self.cities = cities
+        self.sent = sent
+        self.received = received
+
+    def series(self, by='good', direction='received'):
+        """Return (labels, values[bucket, label]) summed over the other dimension."""
+        volumes = self.received if direction == 'received' else self.sent
+        if by == 'good':
+            return self.goods, volumes.sum(axis=2)
+        if by == 'city':
+            return self.cities, volumes.sum(axis=1)
+        if by == 'total':
+            return ['total'], volumes.sum(axis=(1, 2))[:, None]
+        raise ValueError(f"Unknown series: {by}")
+
+    def bucket_labels(self):
+        fmt = '%Y-%m-%d %H:%M' if self.bucket_seconds < 86400 else '%Y-%m-%d'
+        return [datetime.fromtimestamp(int(t)).strftime(fmt) for t in self.edges]
+
+
+def format_bucket_table(volumes, by='good', top=10):
+    """Render ↑received/sent↓ per bucket (rows) and good or city (columns, top by volume)."""
+    labels, received = volumes.series(by, 'received')
+    _, sent = volumes.series(by, 'sent')
+    if not labels:
+        return []
+
+    totals = received.sum(axis=0) + sent.sum(axis=0)
+    order = [i for i in np.argsort(-totals, kind='stable') if totals[i] > 0][:top]
+    if not order:
+        return []
+    max_value = max(received[:, order].max(), sent[:, order].max())
+
+    rows = []
+    for b, bucket_label in enumerate(volumes.bucket_labels()):
+        row = [bucket_label] + [format_trade_cell(int(received[b, i]), int(sent[b, i]), max_value) for i in order]
+        rows.append(row)
+
+    header = [{'good': "Time/Good", 'city': "Time/City"}.get(by, "Time")] + [labels[i] for i in order]
+    return format_box_table(header, rows)
+
+
+def format_bucket_csv(volumes, by='good'):
+    """Render the series as CSV lines: bucket,label,received,sent."""
+    labels, received = volumes.series(by, 'received')
+    _, sent = volumes.series(by, 'sent')
+    lines = ["bucket,name,received,sent"]
+    for b, bucket_label in enumerate(volumes.bucket_labels()):
+        for i, label in enumerate(labels):
+            if received[b, i] or sent[b, i]:
+                lines.append(f"{bucket_label},\"{label}\",{int(received[b, i])},{int(sent[b, i])}")
+    return lines
+
+
+def main():
+    script_dir = Path(__file__).parent
+    repo_root = script_dir.parent
+
+    parser = argparse.ArgumentParser(
+        description='Per-bucket trade volumes from trade-executor-history.json',
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog='''
+Examples:
+  trade_query.py HISTORY --from 6h --bucket 1h            hourly volumes over the last 6 hours
+  trade_query.py HISTORY --from 20:00 --to 22:00 --bucket 5m --by city
+  trade_query.py HISTORY --bucket 1h --format csv > hourly.csv
+        '''
+    )
+    parser.add_argument('history', type=Path, nargs='?',
+                        default=repo_root / 'anno-1800' / 'trade-route-automation' / 'trade-executor-history.json',
+                        help='trade-executor-history.json')
+    parser.add_argument('--from', dest='time_from', help="Window start: 'now', relative ('2h') or absolute")
+    parser.add_argument('--to', dest='time_to', help="Window end (same formats as --from)")
+    parser.add_argument('--bucket', default='1h', help="Bucket size (e.g. '5m', '1h'); default 1h")
+    parser.add_argument('--by', choices=['good', 'city', 'total'], default='good', help="Series dimension")
+    parser.add_argument('--good', action='append', help="Only include this good (repeatable)")
+    parser.add_argument('--city', action='append', help="Only include trades from/to this city (repeatable)")
+    parser.add_argument('--top', type=int, default=10, help="Table columns to show (by volume)")
+    parser.add_argument('--format', choices=['table', 'csv'], default='table')
+    parser.add_argument('--texts', type=Path, default=repo_root / 'anno-1800' / 'texts.json',
+                        help="texts.json with good names")
+    args = parser.parse_args()
+
+    try:
+        time_from = parse_time_bound(args.time_from) if args.time_from else None
+        time_to = parse_time_bound(args.time_to) if args.time_to else None
+        bucket = parse_duration(args.bucket)
+    except ValueError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(1)
+
+    goods_names = load_goods_names(args.texts) if args.texts.exists() else {}
+    trades, _ = load_trades(args.history)
+    if args.good:
+        trades = [t for t in trades
+                  if t.get('good_name', goods_names.get(str(t['good_id']))) in args.good]
+    if args.city:
+        trades = [t for t in trades if t['area_src_name'] in args.city or t['area_dst_name'] in args.city]
+
+    volumes = TradeHistory.from_records(trades, goods_names).bucketed(bucket, time_from, time_to)
+
+    if args.format == 'csv':
+        lines = format_bucket_csv(volumes, args.by)
+    else:
+        lines = format_bucket_table(volumes, args.by, args.top)
+    for line in lines:
+        print(line)
+
+
+if __name__ == '__main__':
+    main()